@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк конвейера отчёта на настоящих лабах из ../02_labs (lab2–lab5).
+
+Замеряется generate_report целиком и по этапам из его ReportMetrics —
+загрузка JSON, замена ссылок на рисунки, сжатие картинок, рендеринг
+шаблона, запись файла, — то есть ровно тот путь, что при обычной сборке.
+Результаты дописываются в историю (JSON, по умолчанию
+.cache/bench/pipeline_history.json в текущей папке), compare сравнивает
+два запуска и отмечает регрессии.
+
+Запуск из папки, где лежит пакет:
+    python -m report_generator.benchmarks.bench_pipeline run [--labs 2-5] [--repeat 5] [--label "до правки"]
+    python -m report_generator.benchmarks.bench_pipeline compare [--threshold 10] [база] [новый]
+
+Кэш картинок по умолчанию выключен (замеряется сжатие); --cache warm
+замеряет повторную сборку с прогретым кэшем. Код выхода compare — 1,
+если есть регрессии.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ..core import image
+from ..core.batch import parse_lab_numbers
+from ..io.disk_cache import DiskCache
+from ..core.report import generate_report
+from ..config import TEMPLATES_DIR
+
+LABS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "..", "02_labs")
+HISTORY_FILE = Path(".cache") / "bench" / "pipeline_history.json"
+STAGES = ("load", "fig_refs", "images", "render", "write", "end_to_end")
+DEFAULT_LABS = "2-5"
+# Регрессией считается замедление больше threshold % и больше MIN_DELTA_MS —
+# иначе шум на этапах в доли миллисекунды даёт ложные срабатывания
+DEFAULT_THRESHOLD = 10.0
+MIN_DELTA_MS = 2.0
+
+
+def _lab_paths(number):
+    lab_dir = os.path.join(LABS_DIR, f"lab{number}")
+    json_file = os.path.join(lab_dir, f"lab{number}.json")
+    images_dir = os.path.join(lab_dir, "images")
+    if not os.path.isfile(json_file):
+        return None
+    return json_file, images_dir if os.path.isdir(images_dir) else None
+
+
+def _use_image_cache(mode, cache_dir):
+    """off — кэш картинок выключен, warm — отдельный кэш во временной папке."""
+    image._image_cache = DiskCache(cache_dir) if mode == "warm" else None
+    image.IMAGE_CACHE_DIR = cache_dir if mode == "warm" else None
+
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def run_stages(json_file, images_dir, base_info, template_dir, out_dir, max_width, codec):
+    """Один проход generate_report; возвращает ({этап: секунды}, число картинок)."""
+    end_to_end, metrics = _timed(
+        generate_report, json_file=json_file, output_file=os.path.join(out_dir, "report.html"),
+        max_width=max_width, base_info_file=base_info, images_dir=images_dir,
+        template_dir=template_dir, force=True, codec=codec,
+    )
+    if not metrics:
+        raise RuntimeError(f"generate_report не собрал отчёт: {json_file}: {metrics.error}")
+    times = {stage: metrics.stages[stage].wall_seconds for stage in STAGES if stage in metrics.stages}
+    times["end_to_end"] = end_to_end
+    return times, len(metrics.images)
+
+
+def bench_lab(number, repeat, template_dir, max_width, codec, cache):
+    """Медиана и минимум по каждому этапу за repeat проходов, в мс."""
+    paths = _lab_paths(number)
+    if paths is None:
+        return None
+    json_file, images_dir = paths
+    base_info = os.path.join(LABS_DIR, "base_info.json")
+    runs = []
+    processed = 0
+    with tempfile.TemporaryDirectory() as tmp_dir, open(os.devnull, "w", encoding="utf-8") as devnull:
+        _use_image_cache(cache, os.path.join(tmp_dir, "cache"))
+        with contextlib.redirect_stdout(devnull):
+            if cache == "warm":
+                run_stages(json_file, images_dir, base_info, template_dir, tmp_dir, max_width, codec)
+            for _ in range(repeat):
+                times, processed = run_stages(json_file, images_dir, base_info, template_dir, tmp_dir,
+                                              max_width, codec)
+                runs.append(times)
+        size = os.path.getsize(os.path.join(tmp_dir, "report.html"))
+    result = {"image_count": processed, "report_bytes": size}
+    for stage in STAGES:
+        values = [run.get(stage, 0.0) * 1000 for run in runs]
+        result[stage] = {"median_ms": round(statistics.median(values), 3), "min_ms": round(min(values), 3)}
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__),
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.isfile(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def print_run(run):
+    print(f"{'Лаба':<6} {'картинок':>8} " + " ".join(f"{stage:>11}" for stage in STAGES) + f" {'отчёт, КБ':>10}")
+    for lab, result in run["labs"].items():
+        cells = " ".join(f"{result[stage]['median_ms']:>11.1f}" for stage in STAGES)
+        print(f"{lab:<6} {result['image_count']:>8} {cells} {result['report_bytes'] / 1024:>10.1f}")
+    print("(медиана, мс)")
+
+
+def cmd_run(args):
+    template_dir = args.templates or str(TEMPLATES_DIR)
+    if not os.path.isdir(template_dir):
+        print(f"Папка шаблонов не найдена: {template_dir} (укажите --templates)")
+        return 1
+    labs = {}
+    for number in parse_lab_numbers(args.labs):
+        result = bench_lab(number, args.repeat, template_dir, args.width, args.codec, args.cache)
+        if result is None:
+            print(f"Пропуск lab{number}: нет {os.path.join(LABS_DIR, f'lab{number}')}")
+            continue
+        labs[f"lab{number}"] = result
+    if not labs:
+        print(f"Лабораторные не найдены в {os.path.abspath(LABS_DIR)}")
+        return 1
+
+    run = {
+        "label": args.label,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "settings": {"repeat": args.repeat, "width": args.width, "codec": args.codec, "cache": args.cache},
+        "labs": labs,
+    }
+    print_run(run)
+    history = load_history(args.history)
+    history.append(run)
+    save_history(args.history, history)
+    print(f"Запуск №{len(history) - 1} записан в {args.history}")
+    return 0
+
+
+def _select(history, ref):
+    """Запуск по номеру (можно отрицательный) или по метке."""
+    try:
+        return history[int(ref)]
+    except ValueError:
+        for run in reversed(history):
+            if run.get("label") == ref:
+                return run
+    raise SystemExit(f"Запуск не найден: {ref}")
+
+
+def compare_runs(base, new, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """Список (лаба, этап, было, стало, изменение %) и признак регрессии для каждой строки."""
+    rows = []
+    for lab, new_result in new["labs"].items():
+        base_result = base["labs"].get(lab)
+        if not base_result:
+            continue
+        for stage in STAGES:
+            before = base_result[stage]["median_ms"]
+            after = new_result[stage]["median_ms"]
+            change = (after - before) / before * 100 if before else 0.0
+            regression = change > threshold and after - before > min_delta_ms
+            rows.append((lab, stage, before, after, change, regression))
+    return rows
+
+
+def cmd_compare(args):
+    history = load_history(args.history)
+    if len(history) < 2:
+        print(f"В {args.history} меньше двух запусков — сравнивать не с чем")
+        return 1
+    base, new = _select(history, args.base), _select(history, args.new)
+    if base["settings"] != new["settings"]:
+        print(f"⚠️ Разные настройки запусков: {base['settings']} и {new['settings']}")
+
+    def name(run):
+        return run.get("label") or f"{run['time']} {run.get('commit') or ''}".strip()
+    print(f"База: {name(base)}\nНовый: {name(new)}\n")
+    print(f"{'Лаба':<6} {'этап':<11} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    rows = compare_runs(base, new, args.threshold)
+    for lab, stage, before, after, change, regression in rows:
+        mark = "  ❌ регрессия" if regression else ""
+        print(f"{lab:<6} {stage:<11} {before:>10.1f} {after:>10.1f} {change:>+9.1f}%{mark}")
+    regressions = sum(1 for row in rows if row[-1])
+    if regressions:
+        print(f"\nРегрессий: {regressions} (порог {args.threshold:g} % и {MIN_DELTA_MS:g} мс)")
+        return 1
+    print(f"\nРегрессий нет (порог {args.threshold:g} %)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера отчёта на лабах из 02_labs")
+    parser.add_argument("--history", default=str(HISTORY_FILE),
+                        help=f"Файл истории запусков, JSON (по умолчанию {HISTORY_FILE})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Замерить этапы и дописать результат в историю")
+    run.add_argument("--labs", default=DEFAULT_LABS, help=f"Лабы, например 2-5 или 2,4 (по умолчанию {DEFAULT_LABS})")
+    run.add_argument("--repeat", type=int, default=5, help="Проходов на лабу (берётся медиана)")
+    run.add_argument("--width", type=int, default=500, help="Максимальная ширина картинок (px)")
+    run.add_argument("--codec", default="auto", help="Кодек картинок, как в CLI")
+    run.add_argument("--cache", choices=("off", "warm"), default="off", help="Кэш картинок")
+    run.add_argument("--templates", help="Папка шаблонов (по умолчанию из config)")
+    run.add_argument("--label", help="Метка запуска, например название ветки")
+
+    compare = sub.add_parser("compare", help="Сравнить два запуска из истории")
+    compare.add_argument("base", nargs="?", default="-2", help="Базовый запуск: номер или метка (по умолчанию предпоследний)")
+    compare.add_argument("new", nargs="?", default="-1", help="Новый запуск: номер или метка (по умолчанию последний)")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help=f"Порог регрессии, % (по умолчанию {DEFAULT_THRESHOLD:g})")
+
+    args = parser.parse_args()
+    return cmd_run(args) if args.command == "run" else cmd_compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
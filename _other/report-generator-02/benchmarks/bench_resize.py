@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение прежнего уменьшения картинок (LANCZOS по полному разрешению)
+с быстрым двухэтапным (draft/reduce + LANCZOS) на больших скриншотах.
+
+Запуск из папки, где лежит пакет:
+    python -m report_generator.benchmarks.bench_resize [--width 800] [--repeat 5] [картинка ...]
+
+Без аргументов берётся самый большой скриншот из ../02_labs, увеличенный
+до 4K (3840 px) — типичный HiDPI-снимок экрана — в PNG и JPEG.
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from ..core import image
+
+
+def _old_resize(path, max_width):
+    with Image.open(path) as img:
+        if img.width > max_width:
+            new_height = int(img.height * max_width / img.width)
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+        return img.size
+
+
+def _fast_resize(path, max_width):
+    with Image.open(path) as img:
+        return image.load_scaled(img, max_width).size
+
+
+def _best_of(func, path, max_width, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(path, max_width)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _image_width(path):
+    with Image.open(path) as img:
+        return img.width
+
+
+def _make_4k_samples(tmp_dir):
+    screenshots = glob.glob(os.path.join(os.path.dirname(__file__), "..", "..", "..", "02_labs", "lab*", "images", "*.png"))
+    if not screenshots:
+        raise SystemExit("Не найдены скриншоты в 02_labs — укажите картинки явно")
+    largest = max(screenshots, key=_image_width)
+    with Image.open(largest) as img:
+        img = img.convert("RGB")
+        big = img.resize((3840, int(img.height * 3840 / img.width)), Image.Resampling.BICUBIC)
+    samples = []
+    for ext in ("png", "jpg"):
+        path = os.path.join(tmp_dir, f"sample_4k.{ext}")
+        big.save(path)
+        samples.append(path)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк уменьшения картинок")
+    parser.add_argument("images", nargs="*", help="Картинки для замера")
+    parser.add_argument("--width", type=int, default=800, help="Целевая ширина (px)")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов на замер (берётся лучший)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = args.images or _make_4k_samples(tmp_dir)
+        print(f"{'Файл':<24} {'Размер':>11} {'LANCZOS, мс':>12} {'быстрый, мс':>12} {'ускорение':>10}")
+        for path in paths:
+            with Image.open(path) as img:
+                size = f"{img.width}x{img.height}"
+            old = _best_of(_old_resize, path, args.width, args.repeat)
+            fast = _best_of(_fast_resize, path, args.width, args.repeat)
+            print(
+                f"{os.path.basename(path):<24} {size:>11} {old * 1000:>12.1f} "
+                f"{fast * 1000:>12.1f} {old / fast:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
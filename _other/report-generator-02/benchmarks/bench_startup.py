@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка времени холодного запуска CLI: python -m report_generator.cli.main --help
+в новом процессе, медиана из нескольких запусков против бюджета.
+
+Запуск из папки, где лежит пакет:
+    python -m report_generator.benchmarks.bench_startup [--budget-ms 300] [--repeat 5] [аргументы cli.main ...]
+
+Код выхода 1, если медиана больше бюджета, — можно ставить в CI.
+Разбивка по импортам печатается для самого медленного запуска.
+"""
+import argparse
+import statistics
+import sys
+
+from ..cli.startup import print_breakdown, run_with_importtime
+
+DEFAULT_BUDGET_MS = 300
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бюджет времени запуска CLI")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Допустимая медиана времени запуска (по умолчанию {DEFAULT_BUDGET_MS} мс)")
+    parser.add_argument("--repeat", type=int, default=5, help="Число запусков")
+    parser.add_argument("--top", type=int, default=10, help="Сколько импортов показать")
+    args, command = parser.parse_known_args()
+    command = command or ["--help"]
+
+    runs = []
+    for _ in range(args.repeat):
+        wall_ms, rows, returncode = run_with_importtime(command)
+        if returncode != 0:
+            print(f"❌ cli.main {' '.join(command)} завершился с кодом {returncode}")
+            return 1
+        runs.append((wall_ms, rows))
+
+    times = [wall_ms for wall_ms, _ in runs]
+    median = statistics.median(times)
+    print(f"cli.main {' '.join(command)}: медиана {median:.0f} мс "
+          f"(мин {min(times):.0f}, макс {max(times):.0f}, запусков {len(times)})\n")
+    print_breakdown(*max(runs, key=lambda run: run[0]), top=args.top)
+
+    if median > args.budget_ms:
+        print(f"\n❌ Медиана {median:.0f} мс превышает бюджет {args.budget_ms:.0f} мс")
+        return 1
+    print(f"\n✅ В бюджете {args.budget_ms:.0f} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
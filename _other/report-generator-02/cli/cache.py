@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""CLI для просмотра и очистки локальных кэшей."""
+import argparse
+import sys
+from ..config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES
+from ..config import RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL
+from ..io.disk_cache import DiskCache
+from ..llm.response_cache import ResponseCache
+
+
+# Имя кэша → (папка, лимит размера) из config
+CACHES = {
+    "images": (IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES),
+    "text": (TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES),
+    "responses": (RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES),
+}
+
+
+def open_caches(kind):
+    """{имя: DiskCache} для выбранного кэша или всех (kind="all"), кроме отключённых."""
+    names = CACHES if kind == "all" else [kind]
+    caches = {}
+    for name in names:
+        cache_dir, max_bytes = CACHES[name]
+        if cache_dir:
+            caches[name] = DiskCache(cache_dir, max_bytes=max_bytes)
+    return caches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Управление кэшами генератора отчётов")
+    parser.add_argument("command", choices=("stats", "prune", "clear"),
+                        help="stats — размер, prune — удалить устаревшие ответы и ужать до лимита, "
+                             "clear — удалить всё")
+    parser.add_argument("--kind", choices=("all",) + tuple(CACHES), default="all", help="Какой кэш")
+    parser.add_argument("--max-mb", type=float,
+                        help="Лимит для prune в МБ (по умолчанию из config)")
+    args = parser.parse_args()
+
+    caches = open_caches(args.kind)
+    if not caches:
+        print("Кэш отключён в config")
+        return 1
+
+    for name, cache in caches.items():
+        if args.command == "prune" and name == "responses":
+            expired = ResponseCache(RESPONSE_CACHE_DIR, ttl=RESPONSE_CACHE_TTL).prune_expired()
+            print(f"{name}: устаревших ответов удалено: {expired}")
+        if args.command == "prune":
+            limit = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+            print(f"{name}: удалено записей: {cache.evict(max_bytes=limit)}")
+        elif args.command == "clear":
+            print(f"{name}: удалено записей: {cache.clear()}")
+        stats = cache.stats()
+        print(f"{name}: {stats['entries']} записей, {stats['bytes'] / 1024 / 1024:.1f} МБ "
+              f"из {stats['max_bytes'] / 1024 / 1024:.0f} МБ ({cache.cache_dir})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
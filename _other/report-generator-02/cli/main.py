@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 """CLI интерфейс для генерации отчётов."""
 import argparse
+import json
 import os
-from core.report import generate_report
-from io.paths import get_lab_json_path
-from config import DATA_DIR
+import sys
+from ..config import DATA_DIR, TEMPLATES_DIR
+
+# Сборка отчётов (Pillow, Jinja2, пул процессов, наблюдатель за файлами)
+# импортируется внутри функций, чтобы --help и ошибки аргументов не ждали её загрузки
+
+PROFILE_FLAGS = ("--profile-startup", "--startup-budget-ms")
 
 
 def main():
@@ -15,11 +20,54 @@ def main():
     parser.add_argument("--base-info", type=str, help="Путь к base_info.json")
     parser.add_argument("--images", type=str, help="Папка с изображениями")
     parser.add_argument("--width", type=int, default=500, help="Максимальная ширина изображений (px)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Число процессов: для одной лабы — на сжатие изображений (по умолчанию 1), "
+                             "в пакетном режиме — на сборку лаб (по умолчанию по числу ядер)")
+    parser.add_argument("--all", action="store_true", help="Собрать все лабораторные из папки данных")
+    parser.add_argument("--labs", type=str, help="Собрать несколько лабораторных, например 1-5 или 1,3,5")
+    parser.add_argument("--force", action="store_true",
+                        help="Пересобрать отчёт, даже если входные данные не изменились")
+    parser.add_argument("--assets", choices=("inline", "lazy", "external"), default="inline",
+                        help="inline — картинки внутри HTML (base64), lazy — тоже внутри, но base64 "
+                             "пишется потоком при записи (меньше памяти), external — отдельными файлами")
+    parser.add_argument("--assets-dir", type=str,
+                        help="Папка для картинок в режиме --assets external (по умолчанию <отчёт>_assets)")
+    parser.add_argument("--codec", choices=("auto", "smart", "png", "jpeg", "webp", "avif"), default="auto",
+                        help="Кодек картинок (auto — как у исходника; smart — по содержимому: "
+                             "палитровый PNG для скриншотов, JPEG/WebP для фото; webp/avif с откатом на PNG)")
+    parser.add_argument("--max-image-kb", type=int,
+                        help="Бюджет на одну картинку в КБ: качество подбирается, чтобы в него влезть")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Встраивать одинаковые картинки один раз, дубликаты подставляются скриптом "
+                             "(без JavaScript видно только первое вхождение)")
+    parser.add_argument("--out-dir", type=str, default=".", help="Папка для отчётов в пакетном режиме")
+    parser.add_argument("--watch", action="store_true",
+                        help="Следить за JSON, картинками, base_info и шаблонами и пересобирать отчёты")
+    parser.add_argument("--poll", action="store_true",
+                        help="В режиме --watch использовать опрос вместо событий файловой системы")
+    parser.add_argument("--metrics-json", type=str,
+                        help="Записать метрики сборки (время и CPU по этапам, размеры картинок, "
+                             "пик памяти по tracemalloc) в JSON; в пакетном режиме — список по лабам")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Запустить ту же команду (без аргументов — --help) с python -X importtime "
+                             "и показать, какие импорты занимают время запуска")
+    parser.add_argument("--startup-budget-ms", type=float,
+                        help="С --profile-startup: код выхода 1, если запуск дольше этого времени")
     
     args = parser.parse_args()
 
+    if args.profile_startup:
+        from .startup import profile_startup
+        sys.exit(profile_startup(_without_profile_flags(sys.argv[1:]), args.startup_budget_ms))
+
+    if args.all or args.labs:
+        sys.exit(run_batch(parser, args))
+
     if not args.lab and not args.json:
-        parser.error("Укажите либо --lab <номер>, либо --json <путь>")
+        parser.error("Укажите либо --lab <номер>, либо --json <путь>, либо --all / --labs")
+
+    from ..core.report import generate_report
+    from ..io.paths import get_lab_json_path
 
     if args.lab:
         json_file = str(get_lab_json_path(args.lab))
@@ -37,13 +85,113 @@ def main():
         if not args.output:
             args.output = os.path.splitext(json_file)[0] + ".html"
 
-    generate_report(
-        json_file=json_file,
-        output_file=args.output,
+    max_image_bytes = args.max_image_kb * 1024 if args.max_image_kb else None
+
+    def build():
+        metrics = generate_report(
+            json_file=json_file,
+            output_file=args.output,
+            max_width=args.width,
+            base_info_file=args.base_info,
+            images_dir=args.images,
+            jobs=args.jobs if args.jobs is not None else 1,
+            force=args.force,
+            assets=args.assets,
+            assets_dir=args.assets_dir,
+            codec=args.codec,
+            max_image_bytes=max_image_bytes,
+            dedup=args.dedup,
+            trace_memory=bool(args.metrics_json),
+        )
+        if args.metrics_json:
+            write_metrics_json(args.metrics_json, metrics.to_dict())
+        return metrics
+
+    build()
+    if args.watch:
+        from ..core.watch import watch
+        inputs = [json_file, str(TEMPLATES_DIR)]
+        inputs += [p for p in (args.images, args.base_info) if p]
+        watch({"report": inputs}, lambda keys: build(), polling=args.poll)
+
+
+def write_metrics_json(path, metrics):
+    """Сохраняет метрики сборки в JSON (перезаписывается при каждой пересборке)."""
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        print(f"Не удалось записать метрики в {path}: {e}")
+
+
+def _without_profile_flags(argv):
+    """Аргументы команды без --profile-startup и --startup-budget-ms (с его значением)."""
+    rest = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == "--startup-budget-ms":
+            skip = True
+        elif not arg.startswith(PROFILE_FLAGS):
+            rest.append(arg)
+    return rest
+
+
+def run_batch(parser, args):
+    """Пакетная сборка: --all или --labs. Возвращает код выхода."""
+    from ..core.batch import build_lab, build_labs, parse_lab_numbers, print_summary
+    from ..io.paths import get_lab_json_path, get_lab_images_dir, discover_labs
+
+    if args.all:
+        lab_numbers = discover_labs()
+    else:
+        try:
+            lab_numbers = parse_lab_numbers(args.labs)
+        except ValueError as e:
+            parser.error(f"Некорректный список лаб: {e}")
+    if not lab_numbers:
+        print(f"Лабораторные не найдены в {DATA_DIR}")
+        return 1
+
+    base_info = args.base_info
+    if not base_info:
+        base_info_candidate = str(DATA_DIR / "base_info.json")
+        if os.path.isfile(base_info_candidate):
+            base_info = base_info_candidate
+
+    options = dict(
+        output_dir=args.out_dir,
         max_width=args.width,
-        base_info_file=args.base_info,
-        images_dir=args.images,
+        base_info_file=base_info,
+        force=args.force,
+        assets=args.assets,
+        assets_dir=args.assets_dir,
+        codec=args.codec,
+        max_image_bytes=args.max_image_kb * 1024 if args.max_image_kb else None,
+        dedup=args.dedup,
+        trace_memory=bool(args.metrics_json),
     )
+    print(f"Сборка лаб: {', '.join(map(str, lab_numbers))}")
+    results = build_labs(lab_numbers, jobs=args.jobs if args.jobs is not None else 0, **options)
+    print_summary(results)
+    if args.metrics_json:
+        write_metrics_json(args.metrics_json, results)
+
+    if args.watch:
+        # Пересборка в этом же процессе: кэши картинок и шаблонов остаются тёплыми
+        from ..core.watch import watch
+        shared = [str(TEMPLATES_DIR)] + ([base_info] if base_info else [])
+        targets = {
+            n: [str(get_lab_json_path(n)), str(get_lab_images_dir(n))] + shared
+            for n in lab_numbers
+        }
+        watch(
+            targets,
+            lambda keys: print_summary([build_lab(n, **options) for n in sorted(keys)]),
+            polling=args.poll,
+        )
+    return 0 if all(r["ok"] for r in results) else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Замер времени запуска CLI: python -X importtime в отдельном процессе."""
+import os
+import subprocess
+import sys
+import time
+from typing import List, NamedTuple, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Имя пакета, как его импортировали (report_generator), — для python -m <пакет>.cli.main
+PACKAGE = __name__.split(".")[0]
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportTime]:
+    """Строки вида "import time:  self | cumulative | [отступ]модуль" из stderr."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок таблицы
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        # После "|" один пробел, дальше по два на уровень вложенности
+        depth = (len(name) - len(stripped) - 1) // 2
+        rows.append(ImportTime(stripped, int(parts[0]), int(parts[1]), depth))
+    return rows
+
+
+def run_with_importtime(argv: List[str]) -> Tuple[float, List[ImportTime], int]:
+    """
+    Запускает python -m <пакет>.cli.main с аргументами argv в новом процессе
+    (в текущей папке, как обычный запуск). Возвращает (время до выхода в мс,
+    импорты, код выхода).
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(ROOT), env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", f"{PACKAGE}.cli.main", *argv],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, encoding="utf-8", errors="replace",
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, parse_importtime(proc.stderr), proc.returncode
+
+
+def print_breakdown(wall_ms: float, rows: List[ImportTime], top: int = 15):
+    """Итог запуска и самые дорогие импорты: верхнего уровня — по накопленному времени, все — по собственному."""
+    total_ms = sum(r.cumulative_us for r in rows if r.depth == 0) / 1000
+    print(f"Запуск: {wall_ms:.0f} мс, из них импорты {total_ms:.0f} мс ({len(rows)} модулей)")
+
+    print(f"\nИмпорты верхнего уровня (накопленное время), топ-{top}:")
+    for r in sorted((r for r in rows if r.depth == 0), key=lambda r: r.cumulative_us, reverse=True)[:top]:
+        print(f"  {r.cumulative_us / 1000:8.1f} мс  {r.module}")
+
+    print(f"\nМодули (собственное время), топ-{top}:")
+    for r in sorted(rows, key=lambda r: r.self_us, reverse=True)[:top]:
+        print(f"  {r.self_us / 1000:8.1f} мс  {r.module}")
+
+
+def profile_startup(argv: List[str], budget_ms: float = None, top: int = 15) -> int:
+    """
+    Печатает разбивку времени импорта для команды cli.main argv
+    (по умолчанию --help). Возвращает 1, если запуск дольше budget_ms.
+    """
+    argv = argv or ["--help"]
+    wall_ms, rows, returncode = run_with_importtime(argv)
+    print(f"Команда: {PACKAGE}.cli.main {' '.join(argv)}")
+    if returncode != 0:
+        print(f"⚠️ Команда завершилась с кодом {returncode}")
+    print_breakdown(wall_ms, rows, top)
+    if budget_ms is not None and wall_ms > budget_ms:
+        print(f"\n❌ Запуск {wall_ms:.0f} мс превышает бюджет {budget_ms:.0f} мс")
+        return 1
+    return 0
@@ -5,8 +5,8 @@ import os
 import json
 
 
-DATA_DIR = "../02_labs/"
-REPORTS_DIR = "../02_labs/"
+DATA_DIR = Path("../02_labs")
+REPORTS_DIR = Path("../02_labs")
 TEMPLATES_DIR = "/templates"
 
 DEFAULT_FORMAT = "html"
@@ -18,20 +18,74 @@ PAGE_MARGINS = {
     "bottom": "20mm"
 }
 
+# Дисковый кэш сжатых изображений (None — отключить)
+IMAGE_CACHE_DIR = Path(".cache") / "images"
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Картинки больше этого числа пикселей декодируются/уменьшаются сразу
+# в уменьшенном масштабе, а не целиком в памяти (None — без ограничения)
+MAX_DECODED_PIXELS = 24_000_000
+
+# Кэш текста, извлечённого из методичек (None — отключить)
+TEXT_CACHE_DIR = Path(".cache") / "text"
+TEXT_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Кэш ответов LLM (None — отключить); TTL в секундах (None — бессрочно)
+RESPONSE_CACHE_DIR = Path(".cache") / "responses"
+RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
+
+# Одновременных запросов к провайдеру при пакетной генерации JSON
+LLM_CONCURRENCY = {
+    "gemini": 2,
+    "groq": 4,
+    "openai": 4,
+    "local": 8,
+}
+
+# Запросы к LLM: общий срок на запрос со всеми повторами (с) и число повторов
+LLM_TIMEOUT = 120
+LLM_MAX_RETRIES = 5
+
+# Бюджет токенов на текст методички в промпте (None — отправлять целиком);
+# задания и вопросы сохраняются, урезается теория. У провайдеров с лимитом
+# tokens_per_minute бюджет дополнительно урезается, чтобы промпт, текст и
+# LLM_RESPONSE_RESERVE_TOKENS на ответ влезали в минутную квоту
+# (LLM_TEXT_FIT_RATE_LIMIT = False — не урезать, например на платном тарифе)
+LLM_TEXT_MAX_TOKENS = 12000
+LLM_RESPONSE_RESERVE_TOKENS = 2000
+LLM_TEXT_FIT_RATE_LIMIT = True
+
+# Лимиты провайдеров (чуть ниже бесплатных квот), None — без ограничения
+LLM_RATE_LIMITS = {
+    "gemini": {"requests_per_minute": 14, "tokens_per_minute": None},
+    "groq": {"requests_per_minute": 28, "tokens_per_minute": 5500},
+    "openai": {"requests_per_minute": None, "tokens_per_minute": None},
+    "local": {"requests_per_minute": None, "tokens_per_minute": None},
+}
+
+# Адрес локального OpenAI-совместимого сервера (python -m report_generator.llm.fake_server)
+LOCAL_LLM_URL = "http://127.0.0.1:8765/v1"
+
+# Байткод скомпилированных шаблонов Jinja2 (None — отключить)
+TEMPLATE_CACHE_DIR = Path(".cache") / "templates"
+
 # Путь к файлу с API ключами (не коммитится в git)
-API_KEYS_FILE = ".api_keys.json"
+API_KEYS_FILE = Path(".api_keys.json")
 
-# API ключи (загружаются из файла или переменных окружения)
+# API ключи (загружаются из файла или переменных окружения при первом обращении)
 API_KEYS = {
     "gemini": None,
     "groq": None,
     "openai": None,
 }
+_api_keys_loaded = False
 
 
 def load_api_keys():
     """Загружает API ключи из файла или переменных окружения."""
-    global API_KEYS
+    global API_KEYS, _api_keys_loaded
+    _api_keys_loaded = True
     
     # Сначала пробуем загрузить из файла
     if API_KEYS_FILE.exists():
@@ -80,7 +134,9 @@ def save_api_keys(keys: dict):
 
 
 def get_api_key(provider: str) -> str:
-    """Получает API ключ для указанного провайдера."""
+    """Получает API ключ для указанного провайдера (ключи читаются при первом вызове)."""
+    if not _api_keys_loaded:
+        load_api_keys()
     return API_KEYS.get(provider.lower())
 
 
@@ -90,6 +146,3 @@ def set_api_key(provider: str, api_key: str):
     API_KEYS[provider] = api_key
     save_api_keys({provider: api_key})
 
-
-# Загружаем ключи при импорте модуля
-load_api_keys()
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 """Основная логика генерации отчётов."""
 from .report import generate_report
+from .metrics import ReportMetrics
 
-__all__ = ['generate_report']
+__all__ = ['generate_report', 'ReportMetrics']
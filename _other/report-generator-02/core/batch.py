@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Пакетная сборка отчётов по нескольким лабораторным."""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ..io.paths import get_lab_json_path, get_lab_images_dir
+from .report import generate_report
+
+
+def parse_lab_numbers(spec):
+    """'1-5' / '1,3,5' / '1-3,7' → [1, 2, 3, 7]."""
+    numbers = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            start, end = int(start), int(end)
+            if start > end:
+                raise ValueError(f"Некорректный диапазон: {part}")
+            numbers.update(range(start, end + 1))
+        else:
+            numbers.add(int(part))
+    return sorted(numbers)
+
+
+def build_lab(lab_number, output_dir=".", max_width=500, base_info_file=None, template_dir=None,
+              force=False, assets="inline", assets_dir=None, codec="auto", max_image_bytes=None,
+              dedup=False, trace_memory=False):
+    """
+    Собирает отчёт одной лабораторной. Возвращает словарь с результатом:
+    lab, ok, seconds, output, error, metrics (ReportMetrics.to_dict() или None).
+    """
+    started = time.perf_counter()
+    output_file = os.path.join(output_dir, f"lab{lab_number}.html")
+    result = {"lab": lab_number, "ok": False, "seconds": 0.0, "output": output_file, "error": None,
+              "metrics": None}
+
+    json_file = str(get_lab_json_path(lab_number))
+    images_dir = str(get_lab_images_dir(lab_number))
+    if not os.path.isdir(images_dir):
+        images_dir = None
+
+    try:
+        if not os.path.isfile(json_file):
+            result["error"] = f"файл не найден: {json_file}"
+        else:
+            metrics = generate_report(
+                json_file=json_file,
+                output_file=output_file,
+                max_width=max_width,
+                base_info_file=base_info_file,
+                images_dir=images_dir,
+                template_dir=template_dir,
+                force=force,
+                assets=assets,
+                assets_dir=assets_dir,
+                codec=codec,
+                max_image_bytes=max_image_bytes,
+                dedup=dedup,
+                trace_memory=trace_memory,
+            )
+            result["ok"] = bool(metrics)
+            result["metrics"] = metrics.to_dict()
+            if not result["ok"]:
+                result["error"] = "ошибка генерации (см. лог выше)"
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def build_labs(lab_numbers, jobs=None, **kwargs):
+    """
+    Собирает отчёты нескольких лабораторных в пуле процессов.
+    jobs — число процессов (None/0 — по числу ядер, 1 — последовательно).
+    kwargs передаются в build_lab. Результаты отсортированы по номеру лабы.
+    """
+    results = []
+    if jobs == 1 or len(lab_numbers) <= 1:
+        for number in lab_numbers:
+            results.append(build_lab(number, **kwargs))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+            futures = {pool.submit(build_lab, number, **kwargs): number for number in lab_numbers}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({
+                        "lab": futures[future], "ok": False, "seconds": 0.0,
+                        "output": None, "error": str(e), "metrics": None,
+                    })
+    return sorted(results, key=lambda r: r["lab"])
+
+
+def print_summary(results):
+    """Печатает итоговую таблицу: лаба, статус, время."""
+    print()
+    print("Итоги сборки:")
+    for r in results:
+        status = "OK    " if r["ok"] else "ОШИБКА"
+        line = f"  lab{r['lab']:<3} {status} {r['seconds']:6.2f} с"
+        if r["ok"]:
+            line += f"  {r['output']}"
+            metrics = r.get("metrics") or {}
+            stages = metrics.get("stages")
+            if stages and not metrics.get("skipped"):
+                slowest = max(stages, key=lambda name: stages[name]["wall_seconds"])
+                line += f"  (дольше всего: {slowest} {stages[slowest]['wall_seconds']:.2f} с)"
+        else:
+            line += f"  {r['error']}"
+        print(line)
+    failed = sum(1 for r in results if not r["ok"])
+    total = sum(r["seconds"] for r in results)
+    print(f"Собрано: {len(results) - failed}/{len(results)}, суммарное время: {total:.2f} с")
@@ -2,33 +2,376 @@
 """Обработка изображений: конвертация в base64, разрешение путей."""
 import os
 import base64
-from PIL import Image
+import hashlib
 import mimetypes
+from ..io.disk_cache import DiskCache
+from ..config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, MAX_DECODED_PIXELS
 
+# Pillow импортируется внутри функций, которым он нужен: команды без картинок
+# (--help, пересборка без изменений) не платят за его загрузку
 
-def image_to_base64(image_path, max_width=800):
-    """Конвертирует изображение в base64, сжимая до max_width."""
+JPEG_QUALITY = 85
+# Двухэтапное уменьшение: сначала целочисленный Image.reduce() (быстрое усреднение
+# блоков), затем LANCZOS с запасом не меньше чем в RESIZE_REDUCING_GAP раз.
+# None — прежний путь: LANCZOS по полному разрешению.
+RESIZE_REDUCING_GAP = 2.0
+AVIF_QUALITY = 80
+
+# Доля пикселей, которую должны покрывать 256 самых частых цветов,
+# чтобы картинка считалась «малоцветной» (скриншот терминала).
+# Цвета сравниваются без PALETTE_TOLERANCE_BITS младших бит канала:
+# оттенки антиалиасинга текста сливаются с основным цветом
+PALETTE_COVERAGE = 0.995
+PALETTE_TOLERANCE_BITS = 2
+# Для «фото» сперва пробуются варианты без потерь (PNG и lossless WebP);
+# сжатие с потерями берётся, только если оно меньше лучшего из них хотя бы
+# в LOSSY_MIN_GAIN раз — иначе скриншоты с антиалиасингом текста уходят
+# в размытый WebP
+LOSSY_MIN_GAIN = 0.75
+
+# Кодек → (формат Pillow, MIME). "auto" — как раньше: JPEG для JPEG, иначе PNG;
+# "smart" — выбор по содержимому картинки (см. analyze_image)
+CODECS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+}
+
+_image_cache = None
+_warned_codecs = set()
+
+
+def get_image_cache():
+    """Общий кэш сжатых изображений (None, если кэш отключён в config)."""
+    global _image_cache
+    if _image_cache is None and IMAGE_CACHE_DIR:
+        _image_cache = DiskCache(IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES)
+    return _image_cache
+
+
+def _guess_mime(image_path):
+    mime_type, _ = mimetypes.guess_type(image_path)
+    return mime_type or "image/png"
+
+
+def _sniff_mime(img_bytes):
+    """MIME по сигнатуре сжатых данных (кэш хранит только байты)."""
+    if img_bytes.startswith(b"\x89PNG"):
+        return "image/png"
+    if img_bytes.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if img_bytes[:4] == b"RIFF" and img_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if img_bytes[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return "application/octet-stream"
+
+
+def codec_available(codec):
+    """Умеет ли установленный Pillow сохранять в этот кодек."""
+    if codec in ("auto", "smart"):
+        return True
+    if codec not in CODECS:
+        return False
+    from PIL import Image
+    Image.init()
+    return CODECS[codec][0] in Image.SAVE
+
+
+def _save(img, codec, quality=None):
+    """Сохраняет картинку в байты. quality=None — режим по умолчанию для кодека."""
+    from io import BytesIO
+    buffer = BytesIO()
+    fmt = CODECS[codec][0]
+    if codec == "png":
+        img.save(buffer, format=fmt, optimize=True)
+    elif codec == "jpeg":
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buffer, format=fmt, optimize=True, quality=quality or JPEG_QUALITY)
+    elif codec == "webp":
+        if quality is None:
+            img.save(buffer, format=fmt, lossless=True, method=4)
+        else:
+            img.save(buffer, format=fmt, quality=quality, method=4)
+    else:
+        img.save(buffer, format=fmt, quality=quality or AVIF_QUALITY)
+    return buffer.getvalue()
+
+
+def _fit_budget(img, codec, max_bytes):
+    """
+    Бинарный поиск наибольшего качества, при котором картинка влезает в max_bytes.
+    Если не влезает даже при минимальном качестве — возвращает минимальное.
+    """
+    low, high = 20, 95
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _save(img, codec, quality)
+        if len(data) <= max_bytes:
+            best = data
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best if best is not None else _save(img, codec, 20)
+
+
+def _fit_png_budget(img, max_bytes):
+    """
+    Бюджет для не-JPEG исходника в режиме "auto": сначала PNG с палитрой
+    (без потерь для малоцветных картинок), затем WebP с подбором качества.
+    Возвращает самый маленький вариант, даже если он не влез.
+    """
+    data = _palette_png(img)
+    if len(data) <= max_bytes or not codec_available("webp"):
+        return data
+    lossy = _fit_budget(img, "webp", max_bytes)
+    return lossy if len(lossy) < len(data) else data
+
+
+def _palette_png(img):
+    """PNG с палитрой из 256 цветов (с прозрачностью — FASTOCTREE, иначе по умолчанию)."""
+    from PIL import Image
+    mode = "RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB"
+    paletted = img.convert(mode).quantize(
+        colors=256, method=Image.Quantize.FASTOCTREE if mode == "RGBA" else None,
+    )
+    return _save(paletted, "png")
+
+
+def _warn_over_budget(image_path, img_bytes, max_bytes):
+    if max_bytes and len(img_bytes) > max_bytes:
+        print(f"⚠️ {os.path.basename(image_path)}: {len(img_bytes) / 1024:.1f} КБ "
+              f"не влезает в бюджет {max_bytes / 1024:.1f} КБ")
+
+
+def _encode_with_codec(img, codec, max_bytes=None):
+    """
+    Кодирует в выбранный кодек с бюджетом; откатывается на PNG, если тот меньше.
+    Для PNG качества нет — сверх бюджета пробуется палитра из 256 цветов.
+    """
+    data = _save(img, codec)
+    if max_bytes and len(data) > max_bytes:
+        if codec == "png":
+            paletted = _palette_png(img)
+            return paletted if len(paletted) < len(data) else data
+        data = _fit_budget(img, codec, max_bytes)
+    if codec != "png":
+        png = _save(img, "png")
+        if len(png) <= len(data):
+            return png
+    return data
+
+
+def _color_histogram(img, tolerance_bits=0):
+    """
+    Частоты цветов картинки по убыванию. Считается векторно через NumPy
+    (упаковка RGB в uint32 + np.unique); без NumPy — через Image.getcolors.
+    tolerance_bits — сколько младших бит канала отбросить перед подсчётом.
+    """
+    rgb = img.convert("RGB")
     try:
-        mime_type, _ = mimetypes.guess_type(image_path)
-        if not mime_type:
-            mime_type = "image/png"
+        import numpy as np
+    except ImportError:
+        if tolerance_bits:
+            rgb = rgb.point(lambda v: v >> tolerance_bits << tolerance_bits)
+        colors = rgb.getcolors(maxcolors=rgb.width * rgb.height)
+        return sorted((count for count, _ in colors), reverse=True)
+    pixels = np.asarray(rgb, dtype=np.uint32) >> tolerance_bits
+    packed = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+    _, counts = np.unique(packed.ravel(), return_counts=True)
+    counts[::-1].sort()
+    return counts.tolist()
+
+
+def analyze_image(img):
+    """
+    Определяет стратегию сжатия по содержимому:
+    "palette" — мало цветов (скриншоты терминала): PNG с палитрой;
+    "photo" — фотография/градиенты: JPEG или WebP;
+    "png" — полупрозрачность, где палитра и JPEG не подходят.
+    """
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        alpha = img.convert("RGBA").getchannel("A")
+        if alpha.getextrema()[0] < 255:
+            return "png", None
+    counts = _color_histogram(img, PALETTE_TOLERANCE_BITS)
+    total = sum(counts)
+    top = sum(counts[:256])
+    if top >= total * PALETTE_COVERAGE:
+        return "palette", len(counts)
+    return "photo", len(counts)
+
+
+def _encode_smart(img, max_bytes=None, source=None):
+    """
+    Кодирует картинку по стратегии analyze_image. Возвращает (стратегия, bytes).
+    source — исходник до уменьшения: стратегия определяется по нему, потому что
+    после LANCZOS у текста появляются сотни промежуточных оттенков.
+    Если вариант по стратегии не влезает в max_bytes, берётся сжатие с потерями.
+    """
+    strategy, _ = analyze_image(source if source is not None else img)
+    candidates = [_save(img, "png")]
+    if strategy == "palette":
+        # 256 цветов покрывают почти все пиксели: теряются только редкие оттенки
+        from PIL import Image
+        paletted = img.convert("RGB").quantize(colors=256, dither=Image.Dither.NONE)
+        candidates.append(_save(paletted, "png"))
+    webp = codec_available("webp")
+    if webp:
+        candidates.append(_save(img, "webp"))  # без потерь
+    best = min(candidates, key=len)
+    over_budget = bool(max_bytes) and len(best) > max_bytes
+    if strategy != "photo" and not over_budget:
+        return strategy, best
+    if strategy == "png" and not webp:
+        return strategy, best  # JPEG потерял бы полупрозрачность
+
+    codec = "webp" if webp else "jpeg"
+    data = _save(img, codec, JPEG_QUALITY)
+    if max_bytes and len(data) > max_bytes:
+        data = _fit_budget(img, codec, max_bytes)
+    if (over_budget and len(data) < len(best)) or (
+            strategy == "photo" and len(data) < len(best) * LOSSY_MIN_GAIN):
+        return strategy, data
+    return strategy, best
+
+
+def _target_size(width, height, max_width):
+    return max_width, int(height * max_width / width)
+
+
+def load_scaled(img, max_width=800):
+    """
+    Декодирует картинку и уменьшает её до max_width.
+
+    JPEG декодируется сразу в уменьшенном масштабе (draft: 1/2, 1/4, 1/8),
+    если он больше max_width или чем MAX_DECODED_PIXELS. Для остальных
+    форматов уменьшения при декодировании нет, поэтому огромные картинки
+    сразу после загрузки сжимаются целочисленным reduce(). Финальный
+    ресэмплинг — LANCZOS с reducing_gap (reduce + LANCZOS за один вызов).
+    """
+    width, height = img.size
+    if img.format == "JPEG" and RESIZE_REDUCING_GAP:
+        target = None
+        if width > max_width:
+            # draft не опускается ниже запрошенного размера — LANCZOS доделает остальное
+            target = _target_size(width, height, int(max_width * RESIZE_REDUCING_GAP))
+        if MAX_DECODED_PIXELS and width * height > MAX_DECODED_PIXELS:
+            scale = (MAX_DECODED_PIXELS / (width * height)) ** 0.5
+            limit = (int(width * scale), int(height * scale))
+            target = limit if target is None or limit[0] < target[0] else target
+        if target:
+            img.draft(img.mode, target)
+    img.load()
+
+    if MAX_DECODED_PIXELS and img.width * img.height > MAX_DECODED_PIXELS:
+        factor = int((img.width * img.height / MAX_DECODED_PIXELS) ** 0.5) + 1
+        factor = min(factor, img.width // max_width)
+        if factor >= 2:
+            img = img.reduce(factor)
 
-        with Image.open(image_path) as img:
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+    if img.width > max_width:
+        from PIL import Image
+        size = _target_size(img.width, img.height, max_width)
+        if RESIZE_REDUCING_GAP:
+            img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+        else:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+    return img
 
-            from io import BytesIO
-            buffer = BytesIO()
 
-            if mime_type == "image/jpeg" and img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
+def encode_image(image_path, max_width=800, codec="auto", max_bytes=None):
+    """
+    Сжимает изображение до max_width. Возвращает (mime_type, bytes).
 
-            fmt = "JPEG" if mime_type == "image/jpeg" else "PNG"
-            img.save(buffer, format=fmt, optimize=True, quality=85)
-            img_bytes = buffer.getvalue()
+    codec — "auto" (JPEG для JPEG, иначе PNG), "smart" (по содержимому),
+    "png", "jpeg", "webp", "avif";
+    max_bytes — бюджет на картинку: качество подбирается, чтобы в него влезть
+    (у PNG качества нет — он уходит в палитру, в "auto" затем ещё в WebP);
+    если не влезло и так — печатается предупреждение.
+    Если кодек недоступен в Pillow или даёт файл больше PNG, используется PNG.
+    """
+    if codec != "auto" and not codec_available(codec):
+        if codec not in _warned_codecs:
+            _warned_codecs.add(codec)
+            print(f"Кодек {codec} не поддерживается установленным Pillow, используется PNG")
+        codec = "png"
 
+    from PIL import Image
+    with Image.open(image_path) as img:
+        # Для "smart" цвета считаются по исходнику (JPEG не в счёт — он и так
+        # с шумом, а полный декод отменил бы draft)
+        source = None
+        if codec == "smart" and img.format != "JPEG":
+            img.load()
+            source = img
+        img = load_scaled(img, max_width)
+
+        if codec == "smart":
+            _, img_bytes = _encode_smart(img, max_bytes, source=source)
+            _warn_over_budget(image_path, img_bytes, max_bytes)
+            return _sniff_mime(img_bytes), img_bytes
+        if codec != "auto":
+            img_bytes = _encode_with_codec(img, codec, max_bytes)
+            _warn_over_budget(image_path, img_bytes, max_bytes)
+            return _sniff_mime(img_bytes), img_bytes
+
+        mime_type = _guess_mime(image_path)
+        if mime_type == "image/jpeg" and img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+
+        from io import BytesIO
+        buffer = BytesIO()
+        fmt = "JPEG" if mime_type == "image/jpeg" else "PNG"
+        img.save(buffer, format=fmt, optimize=True, quality=JPEG_QUALITY)
+        img_bytes = buffer.getvalue()
+        if max_bytes and len(img_bytes) > max_bytes:
+            if fmt == "JPEG":
+                img_bytes = _fit_budget(img, "jpeg", max_bytes)
+            else:
+                img_bytes = _fit_png_budget(img, max_bytes)
+                mime_type = _sniff_mime(img_bytes)
+            _warn_over_budget(image_path, img_bytes, max_bytes)
+        return mime_type, img_bytes
+
+
+def encode_image_cached(image_path, max_width=800, cache=None, codec="auto", max_bytes=None, quiet=False):
+    """
+    encode_image с дисковым кэшем: неизменённые картинки не пережимаются.
+    quiet — не печатать экономию байт для codec="smart".
+    """
+    cache = cache or get_image_cache()
+    if cache is None:
+        _, img_bytes = encode_image(image_path, max_width, codec, max_bytes)
+    else:
+        key = cache.make_key(
+            image_path, max_width=max_width, codec=codec, max_bytes=max_bytes,
+            quality=JPEG_QUALITY, avif_quality=AVIF_QUALITY, palette_coverage=PALETTE_COVERAGE,
+            palette_tolerance=PALETTE_TOLERANCE_BITS, lossy_min_gain=LOSSY_MIN_GAIN,
+            reducing_gap=RESIZE_REDUCING_GAP, max_pixels=MAX_DECODED_PIXELS,
+        )
+        img_bytes = cache.get(key)
+        if img_bytes is None:
+            _, img_bytes = encode_image(image_path, max_width, codec, max_bytes)
+            cache.put(key, img_bytes)
+    # По байтам, а не по имени: в "auto" PNG сверх бюджета может стать WebP
+    mime_type = _sniff_mime(img_bytes)
+    if codec == "smart" and not quiet:
+        source_size = os.path.getsize(image_path)
+        print(
+            f"{os.path.basename(image_path)}: {mime_type}, {source_size} → {len(img_bytes)} Б "
+            f"(сэкономлено {source_size - len(img_bytes)} Б)"
+        )
+    return mime_type, img_bytes
+
+
+def image_to_base64(image_path, max_width=800, cache=None, codec="auto", max_bytes=None):
+    """Конвертирует изображение в base64, сжимая до max_width."""
+    try:
+        mime_type, img_bytes = encode_image_cached(image_path, max_width, cache, codec, max_bytes)
         b64 = base64.b64encode(img_bytes).decode("utf-8")
         return f"data:{mime_type};base64,{b64}"
     except Exception as e:
@@ -36,6 +379,108 @@ def image_to_base64(image_path, max_width=800):
         return None
 
 
+class ImageHandle:
+    """
+    Лёгкая ссылка на сжатую картинку вместо готовой строки data URI.
+
+    В данных лежит только путь и параметры сжатия; сами байты берутся из
+    кэша изображений в момент записи отчёта, а base64 кодируется кусками
+    из memoryview прямо в выходной файл (см. renderer.render_html_to_file).
+    В шаблон подставляется короткий маркер token, который писатель отчёта
+    заменяет на data URI. Если кэш отключён, байты хранятся в самой ссылке.
+    """
+
+    __slots__ = ("image_path", "max_width", "codec", "max_bytes", "mime_type", "dedup_id", "_bytes")
+
+    CHUNK_SIZE = 48 * 1024  # кратно 3: куски base64 склеиваются без '=' внутри
+
+    def __init__(self, image_path, max_width=800, codec="auto", max_bytes=None):
+        self.image_path = image_path
+        self.max_width = max_width
+        self.codec = codec
+        self.max_bytes = max_bytes
+        self.dedup_id = None
+        self.mime_type, img_bytes = encode_image_cached(image_path, max_width, None, codec, max_bytes)
+        self._bytes = img_bytes if get_image_cache() is None else None
+
+    @property
+    def token(self):
+        # id() уникален среди живых объектов процесса; ссылки из воркеров
+        # пула распаковываются в новые объекты, так что маркеры не совпадут
+        return f"\x00img{id(self):x}\x00"
+
+    def __str__(self):
+        return self.token
+
+    def __html__(self):
+        return self.token
+
+    def read(self):
+        """(mime_type, bytes) — из кэша или из самой ссылки."""
+        if self._bytes is not None:
+            return self.mime_type, self._bytes
+        return encode_image_cached(self.image_path, self.max_width, None, self.codec, self.max_bytes, quiet=True)
+
+    def data_uri_size(self):
+        """Длина data URI в символах (без построения самой строки)."""
+        mime_type, img_bytes = self.read()
+        return len(f"data:{mime_type};base64,") + (len(img_bytes) + 2) // 3 * 4
+
+    def write_data_uri(self, f):
+        """Пишет data URI в текстовый файл кусками, не собирая base64 в одну строку."""
+        mime_type, img_bytes = self.read()
+        if self.dedup_id is not None:
+            mime_type = f"{mime_type};img={self.dedup_id}"
+        f.write(f"data:{mime_type};base64,")
+        view = memoryview(img_bytes)
+        for start in range(0, len(view), self.CHUNK_SIZE):
+            f.write(base64.b64encode(view[start:start + self.CHUNK_SIZE]).decode("ascii"))
+
+
+def make_handle(image_path, max_width=800, codec="auto", max_bytes=None):
+    """ImageHandle или None при ошибке сжатия."""
+    try:
+        return ImageHandle(image_path, max_width, codec, max_bytes)
+    except Exception as e:
+        print(f"Ошибка конвертации {image_path}: {e}")
+        return None
+
+
+def write_asset(image_path, assets_dir, max_width=800, cache=None, codec="auto", max_bytes=None):
+    """
+    Сохраняет сжатую картинку в assets_dir под именем из хэша содержимого
+    (одинаковые картинки разных отчётов попадают в один файл).
+    Возвращает имя файла или None при ошибке.
+    """
+    try:
+        mime_type, img_bytes = encode_image_cached(image_path, max_width, cache, codec, max_bytes)
+        ext = mimetypes.guess_extension(mime_type) or ".png"
+        name = hashlib.sha256(img_bytes).hexdigest()[:16] + ext
+        path = os.path.join(assets_dir, name)
+        if not os.path.isfile(path):
+            os.makedirs(assets_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(img_bytes)
+            os.replace(tmp_path, path)
+        return name
+    except Exception as e:
+        print(f"Ошибка сохранения {image_path}: {e}")
+        return None
+
+
+def image_src(image_path, max_width=800, assets_dir=None, codec="auto", max_bytes=None, lazy=False):
+    """
+    data URI (встраивание), имя файла в assets_dir (внешние файлы)
+    или ImageHandle (lazy: base64 пишется только при потоковом рендеринге).
+    """
+    if lazy:
+        return make_handle(image_path, max_width, codec, max_bytes)
+    if assets_dir:
+        return write_asset(image_path, assets_dir, max_width, codec=codec, max_bytes=max_bytes)
+    return image_to_base64(image_path, max_width, codec=codec, max_bytes=max_bytes)
+
+
 def resolve_image_path(src_value, images_dir):
     """По src из JSON (например '1.png' или 'images/1.png') возвращает путь к файлу в images_dir."""
     if not src_value or not images_dir:
@@ -45,25 +490,159 @@ def resolve_image_path(src_value, images_dir):
     return path if os.path.isfile(path) else None
 
 
-def process_images_in_data(data, images_dir=None, max_width=800):
-    """Заменяет src на base64. images_dir — папка с картинками (1.png, 2.png, ...)."""
-    count = 0
-    if not images_dir or not os.path.isdir(images_dir):
-        return count
+def collect_image_refs(data, images_dir):
+    """
+    Первый проход: собирает все ссылки на картинки в дереве данных.
+    Возвращает список (контейнер, ключ, путь_к_файлу) в порядке обхода.
+    """
+    refs = []
     if isinstance(data, dict):
         for key, value in data.items():
             if key == "src" and isinstance(value, str) and not value.startswith("data:"):
                 image_path = resolve_image_path(value, images_dir)
                 if image_path:
-                    b64 = image_to_base64(image_path, max_width)
-                    if b64:
-                        data[key] = b64
-                        count += 1
+                    refs.append((data, key, image_path))
                 else:
                     print(f"Изображение не найдено: {value} в {images_dir}")
             else:
-                count += process_images_in_data(value, images_dir, max_width)
+                refs.extend(collect_image_refs(value, images_dir))
     elif isinstance(data, list):
         for item in data:
-            count += process_images_in_data(item, images_dir, max_width)
+            refs.extend(collect_image_refs(item, images_dir))
+    return refs
+
+
+def _encode_in_worker(args):
+    """Задача для пула процессов: src картинки + счётчики кэша воркера."""
+    image_path, max_width, assets_dir, codec, max_bytes, lazy = args
+    cache = get_image_cache()
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    src = image_src(image_path, max_width, assets_dir, codec, max_bytes, lazy)
+    if cache:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    return src, hits, misses
+
+
+def encode_images_parallel(paths, max_width=800, jobs=None, assets_dir=None, codec="auto", max_bytes=None,
+                           lazy=False):
+    """Кодирует картинки в пуле из jobs процессов. Возвращает {путь: src}."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    unique = list(dict.fromkeys(paths))
+    results = {}
+    cache = get_image_cache()
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        tasks = [(path, max_width, assets_dir, codec, max_bytes, lazy) for path in unique]
+        for path, (src, hits, misses) in zip(unique, pool.map(_encode_in_worker, tasks)):
+            results[path] = src
+            if cache:
+                cache.hits += hits
+                cache.misses += misses
+    return results
+
+
+# Скрипт для отчётов с --dedup: дубликаты получают src="#img-N" и копируют
+# data URI первого вхождения, помеченного параметром ";img=N" в data URI.
+# Без JavaScript (например, в LibreOffice) видно только первое вхождение.
+DEDUP_SCRIPT = """<script>
+document.querySelectorAll('img[src^="#img-"]').forEach(function (el) {
+  var id = el.getAttribute('src').slice(5);
+  var original = document.querySelector('img[src*=";img=' + id + ';"]');
+  if (original) el.src = original.getAttribute('src');
+});
+</script>
+"""
+
+
+def _src_size(src, assets_dir):
+    """Сколько байт занимает src в отчёте (или файл в assets_dir)."""
+    if isinstance(src, ImageHandle):
+        return src.data_uri_size()
+    if assets_dir:
+        return os.path.getsize(os.path.join(assets_dir, src))
+    return len(src)
+
+
+def _mark_original(src, dedup_id):
+    """Помечает data URI первого вхождения параметром ;img=N."""
+    if isinstance(src, ImageHandle):
+        src.dedup_id = dedup_id
+        return src
+    head, sep, tail = src.partition(";base64,")
+    return f"{head};img={dedup_id}{sep}{tail}"
+
+
+def process_images_in_data(data, images_dir=None, max_width=800, jobs=1, assets_dir=None, assets_url=None,
+                           codec="auto", max_bytes=None, lazy=False, dedup=False, stats=None):
+    """
+    Заменяет src на base64. images_dir — папка с картинками (1.png, 2.png, ...).
+    jobs — число процессов для сжатия (1 — последовательно, 0/None — по числу ядер).
+    assets_dir — вместо base64 сохранять картинки файлами в эту папку,
+    а в src писать путь assets_url/<хэш>.<расширение>.
+    codec, max_bytes — кодек и бюджет байт на картинку (см. encode_image).
+    lazy — вместо строки base64 класть в src ImageHandle (встраивание при записи).
+
+    Одинаковые по содержимому картинки (даже под разными именами) сжимаются
+    один раз. dedup — при встраивании писать данные только в первое вхождение,
+    а остальным ставить src="#img-N" (нужен DEDUP_SCRIPT в отчёте); в режиме
+    assets_dir дубликаты и так указывают на один файл.
+    stats — словарь, куда записываются duplicates, saved_bytes и images:
+    по картинке (path, input_bytes, output_bytes, copies) — размер
+    исходника и сколько байт она заняла в отчёте или в assets_dir.
+    """
+    count = 0
+    if not images_dir or not os.path.isdir(images_dir):
+        return count
+
+    refs = collect_image_refs(data, images_dir)
+
+    # Группируем ссылки по хэшу содержимого: первая картинка группы — представитель
+    groups = {}
+    for container, key, image_path in refs:
+        groups.setdefault(DiskCache.file_digest(image_path), []).append((container, key, image_path))
+    representatives = [group[0][2] for group in groups.values()]
+
+    if jobs != 1 and len(representatives) > 1:
+        encoded = encode_images_parallel(representatives, max_width, jobs, assets_dir, codec, max_bytes, lazy)
+    else:
+        encoded = {
+            path: image_src(path, max_width, assets_dir, codec, max_bytes, lazy)
+            for path in representatives
+        }
+
+    duplicates = 0
+    saved_bytes = 0
+    images = []
+    for dedup_id, group in enumerate(groups.values(), start=1):
+        src = encoded[group[0][2]]
+        if not src:
+            continue
+        if stats is not None:
+            # Дубликат без dedup встраивается заново и занимает столько же
+            copies_in_report = 1 if dedup or assets_dir else len(group)
+            images.append({
+                "path": group[0][2],
+                "input_bytes": os.path.getsize(group[0][2]),
+                "output_bytes": _src_size(src, assets_dir) * copies_in_report,
+                "copies": len(group),
+            })
+        if len(group) > 1:
+            duplicates += len(group) - 1
+            if dedup or assets_dir:
+                saved_bytes += _src_size(src, assets_dir) * (len(group) - 1)
+        if assets_dir:
+            src = f"{assets_url}/{src}" if assets_url else src
+        if dedup and not assets_dir and len(group) > 1:
+            group[0][0][group[0][1]] = _mark_original(src, dedup_id)
+            for container, key, _ in group[1:]:
+                container[key] = f"#img-{dedup_id}"
+        else:
+            for container, key, _ in group:
+                container[key] = src
+        count += len(group)
+
+    if stats is not None:
+        stats["duplicates"] = duplicates
+        stats["saved_bytes"] = saved_bytes
+        stats["images"] = images
     return count
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Манифест входных данных отчёта для инкрементальной сборки."""
+import hashlib
+import json
+import os
+from ..io.disk_cache import DiskCache
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(output_file):
+    """Манифест лежит рядом с HTML: lab3.html → lab3.html.manifest.json."""
+    return f"{output_file}{MANIFEST_SUFFIX}"
+
+
+def data_digest(data):
+    """Хэш словаря данных (когда JSON передан не файлом, а из GUI)."""
+    dumped = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()
+
+
+def referenced_images(data, images_dir):
+    """Пути ко всем существующим картинкам, на которые ссылаются src в данных."""
+    paths = []
+    if not images_dir or not os.path.isdir(images_dir):
+        return paths
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == "src" and isinstance(value, str) and not value.startswith("data:"):
+                path = os.path.join(images_dir, os.path.basename(value))
+                if os.path.isfile(path):
+                    paths.append(path)
+            else:
+                paths.extend(referenced_images(value, images_dir))
+    elif isinstance(data, list):
+        for item in data:
+            paths.extend(referenced_images(item, images_dir))
+    return paths
+
+
+def _tree_digests(directory):
+    digests = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, directory).replace(os.sep, "/")
+            digests[rel] = DiskCache.file_digest(path)
+    return digests
+
+
+def build_manifest(source_digest, image_paths, base_info_file, template_dir, settings):
+    """
+    Собирает манифест: хэши JSON лабы, картинок, base_info, файлов шаблонов
+    и настройки, влияющие на результат (max_width и т.п.).
+    """
+    images = {}
+    for path in image_paths:
+        if path not in images:
+            images[path] = DiskCache.file_digest(path)
+    base_info = None
+    if base_info_file and os.path.isfile(base_info_file):
+        base_info = DiskCache.file_digest(base_info_file)
+    return {
+        "version": MANIFEST_VERSION,
+        "source": source_digest,
+        "images": {os.path.basename(p): d for p, d in sorted(images.items())},
+        "base_info": base_info,
+        "templates": _tree_digests(template_dir) if template_dir else {},
+        "settings": settings,
+    }
+
+
+def load_manifest(output_file):
+    """Читает сохранённый манифест или возвращает None."""
+    try:
+        with open(manifest_path(output_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(output_file, manifest):
+    """Сохраняет манифест рядом с отчётом."""
+    try:
+        with open(manifest_path(output_file), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    except OSError as e:
+        print(f"Не удалось сохранить манифест: {e}")
+
+
+def is_up_to_date(output_file, manifest):
+    """Отчёт существует и собран из тех же входных данных."""
+    return os.path.isfile(output_file) and load_manifest(output_file) == manifest
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Метрики сборки отчёта: время этапов, размеры картинок, пик памяти."""
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class StageMetrics:
+    """Время этапа: по часам и процессорное (только этого процесса, без пула)."""
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+
+
+@dataclass
+class ImageMetrics:
+    """Картинка: размер исходника и сколько она занимает в отчёте (data URI или файл)."""
+    path: str
+    input_bytes: int
+    output_bytes: int
+    copies: int = 1
+
+
+@dataclass
+class ReportMetrics:
+    """
+    Результат generate_report. В логическом контексте ведёт себя как
+    прежний True/False: `if generate_report(...)` проверяет ok.
+
+    stages — этапы в порядке выполнения: load, fig_refs, images, render,
+    write. peak_traced_bytes — пик памяти Python-объектов (tracemalloc)
+    за сборку, только если трассировка была запрошена, иначе None;
+    peak_rss_bytes — пик памяти процесса с его запуска (None, где модуля
+    resource нет, например в Windows).
+    """
+    output_file: Optional[str] = None
+    ok: bool = False
+    skipped: bool = False
+    error: Optional[str] = None
+    stages: Dict[str, StageMetrics] = field(default_factory=dict)
+    images: List[ImageMetrics] = field(default_factory=list)
+    output_bytes: int = 0
+    peak_traced_bytes: Optional[int] = None
+    peak_rss_bytes: Optional[int] = None
+
+    def __bool__(self):
+        return self.ok
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замеряет блок кода как этап name (повторные замеры суммируются)."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            metrics = self.stages.setdefault(name, StageMetrics())
+            metrics.wall_seconds += time.perf_counter() - wall
+            metrics.cpu_seconds += time.process_time() - cpu
+
+    @contextmanager
+    def track_memory(self, trace: bool = False):
+        """
+        Пик памяти за блок: пиковый RSS всегда, tracemalloc — только при trace
+        (он вдвое замедляет сборку). Если трассировка уже идёт, её пик
+        сбрасывается, чтобы не учесть память до начала блока.
+        """
+        started = trace and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif trace and hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            if trace:
+                self.peak_traced_bytes = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+            self.peak_rss_bytes = peak_rss_bytes()
+
+    def fail(self, error: str) -> "ReportMetrics":
+        self.ok = False
+        self.error = error
+        return self
+
+    @property
+    def wall_seconds(self) -> float:
+        return sum(s.wall_seconds for s in self.stages.values())
+
+    @property
+    def cpu_seconds(self) -> float:
+        return sum(s.cpu_seconds for s in self.stages.values())
+
+    @property
+    def image_input_bytes(self) -> int:
+        return sum(i.input_bytes for i in self.images)
+
+    @property
+    def image_output_bytes(self) -> int:
+        return sum(i.output_bytes for i in self.images)
+
+    def slowest_stage(self) -> Optional[str]:
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda name: self.stages[name].wall_seconds)
+
+    def to_dict(self) -> dict:
+        """Словарь для JSON (--metrics-json) и передачи между процессами."""
+        data = asdict(self)
+        data.update(
+            wall_seconds=self.wall_seconds,
+            cpu_seconds=self.cpu_seconds,
+            image_input_bytes=self.image_input_bytes,
+            image_output_bytes=self.image_output_bytes,
+        )
+        return data
+
+    def summary(self) -> str:
+        """Одна строка: время этапов и пик памяти."""
+        stages = ", ".join(f"{name} {s.wall_seconds:.2f} с" for name, s in self.stages.items())
+        line = f"Этапы: {stages}; CPU {self.cpu_seconds:.2f} с"
+        if self.peak_traced_bytes is not None:
+            line += f"; пик памяти {self.peak_traced_bytes / 2**20:.1f} МБ"
+        elif self.peak_rss_bytes is not None:
+            line += f"; пик RSS процесса {self.peak_rss_bytes / 2**20:.1f} МБ"
+        if self.images:
+            line += (f"; картинки {self.image_input_bytes / 1024:.0f} → "
+                     f"{self.image_output_bytes / 1024:.0f} КБ")
+        return line
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Пиковый RSS процесса в байтах (ru_maxrss: в Linux — КБ, в macOS — байты)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -1,7 +1,57 @@
 # -*- coding: utf-8 -*-
 """Рендеринг HTML из шаблонов Jinja2."""
-from jinja2 import Environment, FileSystemLoader
-from ..config import TEMPLATES_DIR
+import os
+import re
+from contextlib import nullcontext
+from ..config import TEMPLATES_DIR, TEMPLATE_CACHE_DIR
+from .image import ImageHandle
+
+_HANDLE_TOKEN = re.compile("(\x00img[0-9a-f]+\x00)")
+
+# Папка шаблонов → (отпечаток файлов, Environment)
+_environments = {}
+
+
+def _templates_fingerprint(tpl_dir):
+    """Имена, mtime и размеры всех файлов шаблонов — меняются при любой правке."""
+    items = []
+    for root, _, files in os.walk(tpl_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            items.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(sorted(items))
+
+
+def get_environment(template_dir=None):
+    """
+    Возвращает Environment для папки шаблонов, создавая его один раз.
+
+    Скомпилированные шаблоны кэшируются в памяти (внутри Environment)
+    и на диске (FileSystemBytecodeCache), так что холодный старт не
+    компилирует base.html заново. Если файлы шаблонов изменились,
+    Environment и байткод для этой папки сбрасываются.
+    """
+    tpl_dir = os.path.abspath(template_dir or str(TEMPLATES_DIR))
+    fingerprint = _templates_fingerprint(tpl_dir)
+    cached = _environments.get(tpl_dir)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    # Jinja2 нужен только при рендеринге — не грузим его при импорте модуля
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+    bytecode_cache = None
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+        if cached:
+            bytecode_cache.clear()
+    env = Environment(loader=FileSystemLoader(tpl_dir), bytecode_cache=bytecode_cache)
+    _environments[tpl_dir] = (fingerprint, env)
+    return env
 
 
 def render_html(data: dict, template_dir=None):
@@ -12,8 +62,74 @@ def render_html(data: dict, template_dir=None):
         data: словарь с данными для шаблона
         template_dir: путь к папке с шаблонами (по умолчанию из config)
     """
-    tpl_dir = template_dir or str(TEMPLATES_DIR)
-    env = Environment(loader=FileSystemLoader(tpl_dir))
-    template = env.get_template("base.html")
+    template = get_environment(template_dir).get_template("base.html")
     # Передаём данные как **kwargs для шаблона
     return template.render(**data)
+
+
+def _collect_handles(data, handles=None):
+    """{маркер: ImageHandle} для всех ленивых картинок в данных."""
+    if handles is None:
+        handles = {}
+    if isinstance(data, ImageHandle):
+        handles[data.token] = data
+    elif isinstance(data, dict):
+        for value in data.values():
+            _collect_handles(value, handles)
+    elif isinstance(data, list):
+        for item in data:
+            _collect_handles(item, handles)
+    return handles
+
+
+def _write_chunk(f, chunk, handles):
+    """Пишет кусок HTML, подставляя data URI вместо маркеров ImageHandle."""
+    if not handles or "\x00img" not in chunk:
+        f.write(chunk)
+        return
+    for part in _HANDLE_TOKEN.split(chunk):
+        handle = handles.get(part)
+        if handle is not None:
+            handle.write_data_uri(f)
+        else:
+            f.write(part)
+
+
+def render_html_to_file(data: dict, output_file, template_dir=None, buffer_size=1024 * 1024, tail=None,
+                        metrics=None):
+    """
+    Рендерит HTML потоком прямо в файл, не собирая весь отчёт в одну строку.
+
+    Куски из template.generate() пишутся в буферизованный файл по мере
+    появления; ImageHandle в данных превращаются в data URI прямо при
+    записи. Пишем во временный файл и подменяем им output_file только
+    после успешного рендеринга, чтобы ошибка не оставила обрезанный отчёт.
+    tail — HTML, дописываемый в конец файла (например, DEDUP_SCRIPT).
+    metrics — ReportMetrics: генерация кусков HTML считается этапом
+    render, их запись (вместе с base64 ленивых картинок) — этапом write.
+    """
+    stage = metrics.stage if metrics is not None else (lambda name: nullcontext())
+    with stage("render"):
+        template = get_environment(template_dir).get_template("base.html")
+        handles = _collect_handles(data)
+        chunks = template.generate(**data)
+    tmp_file = f"{output_file}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8", buffering=buffer_size) as f:
+            while True:
+                with stage("render"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                with stage("write"):
+                    _write_chunk(f, chunk, handles)
+            with stage("write"):
+                if tail:
+                    f.write(tail)
+                f.flush()
+        with stage("write"):
+            os.replace(tmp_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
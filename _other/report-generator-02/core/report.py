@@ -2,10 +2,13 @@
 """Генерация HTML-отчёта из JSON данных."""
 import json
 import os
-from image import process_images_in_data
-from text_processing import apply_fig_refs_in_data
-from renderer import render_html
-from config import TEMPLATES_DIR
+from .image import DEDUP_SCRIPT, process_images_in_data, get_image_cache
+from .text_processing import apply_fig_refs_in_data
+from .renderer import render_html_to_file
+from .manifest import build_manifest, data_digest, is_up_to_date, referenced_images, save_manifest
+from ..io.disk_cache import DiskCache
+from .metrics import ImageMetrics, ReportMetrics
+from ..config import TEMPLATES_DIR
 
 
 def load_and_merge_data(lab_json_path, base_info_path=None):
@@ -35,6 +38,14 @@ def generate_report(
     base_info_file=None,
     images_dir=None,
     template_dir=None,
+    jobs=1,
+    force=False,
+    assets="inline",
+    assets_dir=None,
+    codec="auto",
+    max_image_bytes=None,
+    dedup=False,
+    trace_memory=False,
 ):
     """
     Генерирует HTML отчёт.
@@ -47,22 +58,64 @@ def generate_report(
         base_info_file: путь к base_info.json (универ, студент, преподаватель)
         images_dir: папка с картинками (1.png, 2.png, ...)
         template_dir: папка с шаблонами (по умолчанию из config)
+        jobs: число процессов для сжатия изображений (1 — последовательно)
+        force: пересобрать, даже если входные данные не изменились
+        assets: "inline" — картинки встраиваются base64 (один файл для сдачи),
+            "lazy" — тоже встраиваются, но base64 пишется кусками прямо в файл
+            при рендеринге (в памяти не лежат строки data URI),
+            "external" — сохраняются файлами рядом с отчётом
+        assets_dir: папка для картинок в режиме "external"
+            (по умолчанию <отчёт>_assets; общая папка делит файлы между отчётами)
+        codec: кодек картинок — "auto", "png", "jpeg", "webp", "avif"
+        max_image_bytes: бюджет байт на одну картинку (подбор качества)
+        dedup: встраивать одинаковые картинки один раз, а дубликаты
+            подставлять скриптом (без JavaScript видно только первое вхождение)
+        trace_memory: замерять пик памяти Python-объектов через tracemalloc
+            (заметно замедляет сборку; без него в метриках только пиковый RSS)
+
+    Returns:
+        ReportMetrics — время и CPU по этапам, размеры картинок, пик памяти;
+        в логическом контексте истинен, если отчёт собран (или не изменился).
     """
+    metrics = ReportMetrics(output_file=output_file or "report.html")
+    with metrics.track_memory(trace=trace_memory):
+        _build_report(
+            metrics, json_file, metrics.output_file, max_width, data, base_info_file, images_dir,
+            template_dir, jobs, force, assets, assets_dir, codec, max_image_bytes, dedup,
+        )
+    if metrics.ok and not metrics.skipped:
+        print(metrics.summary())
+    return metrics
+
+
+def _build_report(metrics, json_file, output_file, max_width, data, base_info_file, images_dir,
+                  template_dir, jobs, force, assets, assets_dir, codec, max_image_bytes, dedup):
+    """Тело generate_report; результат и замеры пишет в metrics."""
+    if data is None and json_file and os.path.isfile(json_file):
+        source_digest = DiskCache.file_digest(json_file)
+    elif data is not None:
+        source_digest = data_digest(data)
+    else:
+        source_digest = None
+
     if data is None:
         if not json_file:
             print("Не указан источник данных (json_file или data)")
-            return False
+            metrics.fail("не указан источник данных")
+            return
         try:
-            data = load_and_merge_data(json_file, base_info_file)
+            with metrics.stage("load"):
+                data = load_and_merge_data(json_file, base_info_file)
             print(f"Загружен JSON: {json_file}")
         except Exception as e:
             print(f"Ошибка загрузки JSON: {e}")
-            return False
+            metrics.fail(f"ошибка загрузки JSON: {e}")
+            return
     else:
         # Если data передан напрямую, всё равно попробуем подмешать base_info
         if base_info_file and os.path.isfile(base_info_file):
             try:
-                with open(base_info_file, "r", encoding="utf-8") as f:
+                with metrics.stage("load"), open(base_info_file, "r", encoding="utf-8") as f:
                     base = json.load(f)
                 for key in ("university", "student", "teacher", "location"):
                     if key in base and key not in data:
@@ -70,41 +123,90 @@ def generate_report(
             except Exception as e:
                 print(f"Не удалось загрузить base_info: {e}")
 
-    # Замена (Рис. N) → как показано на Рисунке N
-    apply_fig_refs_in_data(data)
-
-    # Обработка изображений
     if images_dir:
         images_dir = os.path.abspath(images_dir)
-    processed = process_images_in_data(data, images_dir=images_dir, max_width=max_width)
-    if processed > 0:
-        print(f"Встроено изображений: {processed}")
-    elif images_dir:
-        print(f"Папка с изображениями указана, но изображения не найдены: {images_dir}")
-
-    # Рендеринг HTML
     tpl_dir = template_dir or str(TEMPLATES_DIR)
-    print(TEMPLATES_DIR)
     if not os.path.isdir(tpl_dir):
         print(f"Папка шаблонов не найдена: {tpl_dir}")
-        return False
+        metrics.fail(f"папка шаблонов не найдена: {tpl_dir}")
+        return
+    assets_url = None
+    if assets == "external":
+        if not assets_dir:
+            assets_dir = os.path.splitext(output_file)[0] + "_assets"
+        assets_dir = os.path.abspath(assets_dir)
+        assets_url = os.path.relpath(assets_dir, os.path.dirname(os.path.abspath(output_file)))
+        assets_url = assets_url.replace(os.sep, "/")
+        if not os.path.isdir(assets_dir):
+            force = True  # папку с картинками удалили — манифесту верить нельзя
+    else:
+        assets_dir = None
 
-    try:
-        html = render_html(data, template_dir=tpl_dir)
-    except Exception as e:
-        print(f"Ошибка рендеринга: {e}")
-        return False
+    # Инкрементальная сборка: входные данные не менялись — файл не трогаем
+    manifest = build_manifest(
+        source_digest,
+        referenced_images(data, images_dir),
+        base_info_file,
+        tpl_dir,
+        settings={
+            "max_width": max_width,
+            "assets": assets,
+            "assets_url": assets_url,
+            "codec": codec,
+            "max_image_bytes": max_image_bytes,
+            "dedup": dedup,
+        },
+    )
+    if not force and is_up_to_date(output_file, manifest):
+        print(f"Без изменений, пропуск: {output_file}")
+        metrics.ok = metrics.skipped = True
+        return
+
+    # Замена (Рис. N) → как показано на Рисунке N
+    with metrics.stage("fig_refs"):
+        apply_fig_refs_in_data(data)
 
-    # Сохранение
-    if not output_file:
-        output_file = "report.html"
+    # Обработка изображений
+    image_stats = {}
+    with metrics.stage("images"):
+        processed = process_images_in_data(
+            data, images_dir=images_dir, max_width=max_width, jobs=jobs,
+            assets_dir=assets_dir, assets_url=assets_url,
+            codec=codec, max_bytes=max_image_bytes, lazy=(assets == "lazy"),
+            dedup=dedup, stats=image_stats,
+        )
+    metrics.images = [ImageMetrics(**image) for image in image_stats.get("images", [])]
+    if processed > 0 and assets_dir:
+        print(f"Изображений сохранено в {assets_dir}: {processed}")
+    elif processed > 0:
+        print(f"Встроено изображений: {processed}")
+    elif images_dir:
+        print(f"Папка с изображениями указана, но изображения не найдены: {images_dir}")
+    duplicates = image_stats.get("duplicates", 0)
+    if duplicates:
+        saved_bytes = image_stats.get("saved_bytes", 0)
+        if saved_bytes:
+            print(f"Дубликатов изображений: {duplicates}, сэкономлено {saved_bytes / 1024:.1f} КБ")
+        else:
+            print(f"Дубликатов изображений: {duplicates} (сжаты один раз; --dedup уменьшит отчёт)")
+    cache = get_image_cache()
+    if cache is not None and (cache.hits or cache.misses):
+        print(f"Кэш изображений: {cache.hits} попаданий, {cache.misses} промахов")
+
+    # Рендеринг HTML потоком в файл
     out_dir = os.path.dirname(output_file)
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
-    
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(html)
+    try:
+        tail = DEDUP_SCRIPT if dedup and duplicates and not assets_dir else None
+        render_html_to_file(data, output_file, template_dir=tpl_dir, tail=tail, metrics=metrics)
+    except Exception as e:
+        print(f"Ошибка рендеринга: {e}")
+        metrics.fail(f"ошибка рендеринга: {e}")
+        return
+    with metrics.stage("write"):
+        save_manifest(output_file, manifest)
 
-    size_kb = os.path.getsize(output_file) / 1024
-    print(f"Отчёт сохранён: {output_file} ({size_kb:.2f} КБ)")
-    return True
+    metrics.ok = True
+    metrics.output_bytes = os.path.getsize(output_file)
+    print(f"Отчёт сохранён: {output_file} ({metrics.output_bytes / 1024:.2f} КБ)")
@@ -1,7 +1,7 @@
-from io.json_loader import load_json
-from io.paths import get_lab_json_path
-from core.schema import validate_report_data
-from core.report import generate_report
+from ..io.json_loader import load_json
+from ..io.paths import get_lab_json_path
+from .schema import validate_report_data
+from .report import generate_report
 
 
 class ReportBuilder:
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Слежение за файлами отчёта и пересборка при изменениях (режим --watch)."""
+import os
+import queue
+import time
+
+
+def snapshot(paths):
+    """{путь_к_файлу: (mtime_ns, размер)} для файлов и содержимого папок."""
+    state = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    full = os.path.join(root, name)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    state[full] = (st.st_mtime_ns, st.st_size)
+        elif os.path.isfile(path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # удалён между проверкой и stat (например, swap-файл редактора)
+            state[path] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def changed_paths(before, after):
+    """Файлы, которые появились, исчезли или изменились между снимками."""
+    changed = {p for p in after if before.get(p) != after[p]}
+    changed.update(p for p in before if p not in after)
+    return changed
+
+
+def affected_targets(targets, paths):
+    """Ключи целей, среди входов которых есть хотя бы один из изменённых путей."""
+    affected = set()
+    for key, inputs in targets.items():
+        for changed in paths:
+            changed = os.path.abspath(changed)
+            for watched in inputs:
+                watched = os.path.abspath(watched)
+                if changed == watched or changed.startswith(watched + os.sep):
+                    affected.add(key)
+                    break
+            if key in affected:
+                break
+    return affected
+
+
+def _start_observer(paths, events):
+    """
+    Запускает watchdog (inotify/FSEvents/ReadDirectoryChanges), если он установлен.
+    Возвращает observer или None — тогда используется опрос.
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory and event.event_type == "modified":
+                return
+            events.put(event.src_path)
+            dest = getattr(event, "dest_path", None)
+            if dest:
+                events.put(dest)
+
+    observer = Observer()
+    handler = _Handler()
+    scheduled = set()
+    try:
+        for path in paths:
+            folder = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+            if folder in scheduled or not os.path.isdir(folder):
+                continue
+            observer.schedule(handler, folder, recursive=os.path.isdir(path))
+            scheduled.add(folder)
+        observer.start()
+    except (OSError, RuntimeError) as e:
+        # Например, исчерпан лимит inotify watches
+        print(f"Не удалось запустить watchdog ({e}), используется опрос")
+        return None
+    return observer
+
+
+def watch(targets, rebuild, interval=0.5, debounce=0.3, polling=False):
+    """
+    Следит за входными файлами и вызывает rebuild(ключи_целей) после изменений.
+
+    Args:
+        targets: {ключ: [пути файлов/папок]} — входы каждого отчёта; общие входы
+            (base_info, шаблоны) просто перечисляются у всех целей
+        rebuild: функция, получающая множество затронутых ключей
+        interval: период опроса файловой системы в секундах
+        debounce: пауза тишины, после которой серия изменений считается завершённой
+        polling: не использовать watchdog, только опрос
+    """
+    all_paths = sorted({p for inputs in targets.values() for p in inputs})
+    events = queue.Queue()
+    observer = None if polling else _start_observer(all_paths, events)
+    mode = "события ФС" if observer else f"опрос каждые {interval} с"
+    print(f"Слежение за изменениями ({mode}). Ctrl+C — выход.")
+
+    state = snapshot(all_paths)
+    pending = set()
+    last_change = 0.0
+    try:
+        while True:
+            if observer:
+                try:
+                    pending.add(events.get(timeout=interval))
+                    last_change = time.monotonic()
+                    while True:
+                        pending.add(events.get_nowait())
+                except queue.Empty:
+                    pass
+            else:
+                time.sleep(interval)
+                current = snapshot(all_paths)
+                changes = changed_paths(state, current)
+                state = current
+                if changes:
+                    pending.update(changes)
+                    last_change = time.monotonic()
+
+            if pending and time.monotonic() - last_change >= debounce:
+                keys = affected_targets(targets, pending)
+                pending = set()
+                if keys:
+                    rebuild(keys)
+    except KeyboardInterrupt:
+        print("Слежение остановлено")
+    finally:
+        if observer:
+            observer.stop()
+            observer.join()
@@ -6,16 +6,15 @@ import os
 import json
 from shutil import copy2
 import threading
+from importlib.util import find_spec
 
-try:
-    from PIL import Image
-except ImportError:
+# Pillow, Jinja2 и стек LLM импортируются при первой генерации, а не при
+# запуске окна; здесь только проверяем, что Pillow установлен
+if find_spec("PIL") is None:
     messagebox.showerror("Ошибка", "Установите Pillow: pip install pillow")
     exit(1)
 
-from report-generator.core.report import generate_report
 from ..config import TEMPLATES_DIR, get_api_key, set_api_key, load_api_keys
-from ..llm.generator import generate_lab_json
 
 
 class LabReportGUI:
@@ -231,10 +230,25 @@ class LabReportGUI:
             messagebox.showerror("Ошибка", f"Укажите API ключ для {provider} или сохраните его в настройках")
             return
 
+        from ..llm.generator import describe_section, generate_lab_json
+
         self.llm_status.config(text="Генерация... (извлечение информации о лабе и создание JSON)", foreground="blue")
         self.extracted_lab_info.set("Извлечение информации...")
         self.root.update()
 
+        received = []
+
+        def on_section(path, value):
+            # Вызывается из рабочего потока по мере получения ответа
+            if len(path) == 1 and isinstance(value, list):
+                return  # элементы списка уже показаны по одному
+            if path == ("lab",) and isinstance(value, dict):
+                info = f"Лабораторная работа №{value.get('number', '?')}: {value.get('theme', 'не определена')}"
+                self.root.after(0, lambda: self.extracted_lab_info.set(info))
+            received.append(describe_section(path))
+            text = f"Генерация... получено: {', '.join(received[-4:])} (всего разделов: {len(received)})"
+            self.root.after(0, lambda: self.llm_status.config(text=text, foreground="blue"))
+
         def generate():
             try:
                 output_path = self.output_json_path.get().strip() or None
@@ -247,6 +261,7 @@ class LabReportGUI:
                     lab_theme=None,  # Автоматическое извлечение
                     provider=provider,
                     api_key=api_key,
+                    on_section=on_section,
                 )
                 
                 # Обновляем информацию о лабе
@@ -429,6 +444,7 @@ class LabReportGUI:
             images_dir = None
 
         try:
+            from ..core.report import generate_report
             ok = generate_report(
                 output_file=out,
                 max_width=width,
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Дисковый кэш байтов с адресацией по содержимому исходного файла."""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class DiskCache:
+    """
+    Кэш результатов обработки файлов: сжатых изображений, текста PDF,
+    ответов LLM.
+
+    Ключ — хэш содержимого исходного файла плюс параметры обработки
+    (для картинок — max_width, формат, качество), поэтому переименование
+    файла не сбрасывает кэш, а любое изменение файла или настроек — сбрасывает.
+    Размер ограничен max_bytes, при переполнении удаляются записи,
+    которые дольше всех не использовались (LRU по mtime файла).
+
+    Поверх диска держится небольшой LRU в памяти (memory_bytes), чтобы
+    долгоживущий процесс (режим --watch) не перечитывал файлы кэша.
+    Один объект можно делить между потоками: LRU в памяти и счётчики
+    меняются под блокировкой, файлы читаются и пишутся вне её.
+    """
+
+    # (путь) → (mtime_ns, размер, sha256): не пересчитываем хэш неизменённых файлов
+    _digest_memo = {}
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, memory_bytes=64 * 1024 * 1024):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        self._memory = OrderedDict()
+        self._memory_total = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def file_digest(cls, path):
+        """SHA-256 содержимого файла (запоминается до изменения mtime/размера)."""
+        st = os.stat(path)
+        memo = cls._digest_memo.get(path)
+        if memo and memo[0] == st.st_mtime_ns and memo[1] == st.st_size:
+            return memo[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        cls._digest_memo[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def make_key(self, path, **params):
+        """Ключ записи: хэш файла + отсортированные параметры обработки."""
+        h = hashlib.sha256(self.file_digest(path).encode("ascii"))
+        for name in sorted(params):
+            h.update(f"|{name}={params[name]}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_total -= len(old)
+        self._memory[key] = data
+        self._memory_total += len(data)
+        while self._memory_total > self.memory_bytes:
+            _, dropped = self._memory.popitem(last=False)
+            self._memory_total -= len(dropped)
+
+    def get(self, key):
+        """Возвращает байты из кэша или None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # отмечаем использование для LRU
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        """Сохраняет байты в кэш и при необходимости вытесняет старые записи."""
+        with self._lock:
+            self._remember(key, data)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._entry_path(key)
+            # Своё имя у каждого потока: одинаковый ключ могут писать двое сразу
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Не удалось записать в кэш: {e}")
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes=None):
+        """Удаляет давно не использованные записи, пока кэш не влезет в лимит."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._total_bytes = total
+        return removed
+
+    def remove_where(self, predicate):
+        """Удаляет записи, для байтов которых predicate(data) истинно."""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            if not predicate(data):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+        if removed:
+            with self._lock:
+                self._memory.clear()
+                self._memory_total = 0
+                self._total_bytes = None
+        return removed
+
+    def clear(self):
+        """Полностью очищает кэш."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_total = 0
+            return self.evict(max_bytes=0)
+
+    def stats(self):
+        """Счётчики попаданий/промахов и текущий размер кэша."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
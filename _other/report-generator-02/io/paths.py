@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """Утилиты для работы с путями."""
 from pathlib import Path
-from report_generator.config import DATA_DIR
+from ..config import DATA_DIR
 
 
 def get_lab_json_path(lab_number: int):
@@ -12,3 +12,13 @@ def get_lab_json_path(lab_number: int):
 def get_lab_images_dir(lab_number: int):
     """Возвращает путь к папке с изображениями лабораторной работы."""
     return DATA_DIR / f"lab{lab_number}" / "images"
+
+
+def discover_labs():
+    """Возвращает отсортированные номера лабораторных, для которых есть JSON."""
+    numbers = []
+    for folder in Path(DATA_DIR).glob("lab*"):
+        suffix = folder.name[len("lab"):]
+        if folder.is_dir() and suffix.isdigit() and get_lab_json_path(int(suffix)).is_file():
+            numbers.append(int(suffix))
+    return sorted(numbers)
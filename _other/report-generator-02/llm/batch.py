@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Пакетная генерация JSON по всем методичкам папки (asyncio)."""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+from ..config import LLM_CONCURRENCY
+from .client import create_client
+from .text_cache import extract_text_cached
+from .text_extractor import guess_lab_info, load_lab_prompt
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+
+
+def find_lab_files(folder: str) -> List[str]:
+    """Файлы методичек в папке, отсортированные по номеру лабы из имени."""
+    files = [
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+    ]
+
+    def order(path):
+        number, _ = guess_lab_info(path)
+        return (number is None, number or 0, os.path.basename(path))
+
+    return sorted(files, key=order)
+
+
+def _extract_in_worker(file_path: str):
+    """
+    Точка входа для процесса пула: (текст, секунды извлечения).
+    Внутри один процесс, без вложенного пула.
+    """
+    started = time.perf_counter()
+    text = extract_text_cached(file_path, jobs=1)
+    return text, time.perf_counter() - started
+
+
+def _output_path(output_dir: str, file_path: str, lab_number: Optional[int]) -> str:
+    if lab_number is not None:
+        return os.path.join(output_dir, f"lab{lab_number}.json")
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0] + ".json")
+
+
+async def generate_all(
+    files: List[str],
+    output_dir: str = ".",
+    provider: str = "groq",
+    concurrency: Optional[int] = None,
+    api_key: Optional[str] = None,
+    prompt_file: Optional[str] = None,
+    use_cache: bool = True,
+    extract_jobs: Optional[int] = None,
+) -> List[dict]:
+    """
+    Генерирует JSON для всех файлов.
+
+    Извлечение текста идёт в пуле процессов и перекрывается с уже
+    отправленными запросами к LLM. Одновременных запросов к провайдеру —
+    не больше concurrency (по умолчанию LLM_CONCURRENCY из config).
+    Каждый JSON записывается сразу после ответа. Возвращает список
+    словарей file, ok, seconds, output, error в порядке завершения.
+
+    Args:
+        files: пути к методичкам
+        output_dir: папка для lab<N>.json
+        provider: провайдер LLM ("gemini", "groq", "openai", "local")
+        concurrency: лимит одновременных запросов к провайдеру
+        api_key: API ключ (если None, берётся из config)
+        prompt_file: путь к файлу с промптом
+        use_cache: использовать кэш ответов LLM
+        extract_jobs: процессов для извлечения текста (None — по числу ядер)
+    """
+    concurrency = concurrency or LLM_CONCURRENCY.get(provider, 1)
+    os.makedirs(output_dir, exist_ok=True)
+    client = create_client(provider, api_key, use_cache=use_cache)
+    lab_prompt = load_lab_prompt(prompt_file)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    done = 0
+
+    def report(result):
+        nonlocal done
+        done += 1
+        name = os.path.basename(result["file"])
+        if result["ok"]:
+            print(f"[{done}/{len(files)}] ✅ {name}: {result['seconds']:.1f} с "
+                  f"(текст {result['extract_seconds']:.1f} с, LLM {result['llm_seconds']:.1f} с) → {result['output']}")
+        else:
+            print(f"[{done}/{len(files)}] ❌ {name}: {result['error']}")
+
+    async def process(file_path, extract_pool, llm_pool):
+        started = time.perf_counter()
+        result = {"file": file_path, "ok": False, "seconds": 0.0, "output": None, "error": None,
+                  "extract_seconds": 0.0, "llm_seconds": 0.0}
+        try:
+            lab_text, result["extract_seconds"] = await loop.run_in_executor(
+                extract_pool, _extract_in_worker, file_path,
+            )
+            lab_number, lab_theme = guess_lab_info(file_path, lab_text)
+
+            async with semaphore:
+                llm_started = time.perf_counter()
+                data = await loop.run_in_executor(
+                    llm_pool,
+                    lambda: client.generate_json_from_text(
+                        lab_text=lab_text, lab_prompt=lab_prompt,
+                        lab_number=lab_number, lab_theme=lab_theme,
+                    ),
+                )
+                result["llm_seconds"] = time.perf_counter() - llm_started
+
+            output = _output_path(output_dir, file_path, lab_number)
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            result.update(ok=True, output=output)
+        except Exception as e:
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - started
+        results.append(result)
+        report(result)
+
+    print(f"🤖 {len(files)} методичек, {provider}, до {concurrency} запросов одновременно")
+    with ProcessPoolExecutor(max_workers=extract_jobs) as extract_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as llm_pool:
+        await asyncio.gather(*(process(path, extract_pool, llm_pool) for path in files))
+    return results
+
+
+def print_summary(results: List[dict], wall_seconds: float):
+    """Итоги: сколько файлов готово, суммарное и фактическое время."""
+    failed = [r for r in results if not r["ok"]]
+    total = sum(r["extract_seconds"] + r["llm_seconds"] for r in results)
+    print()
+    print(f"Готово: {len(results) - len(failed)}/{len(results)}, "
+          f"время: {wall_seconds:.1f} с (последовательно было бы ~{total:.1f} с)")
+    for r in failed:
+        print(f"  ❌ {os.path.basename(r['file'])}: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация JSON по всем методичкам папки")
+    parser.add_argument("folder", help="Папка с методичками (PDF, TXT, MD)")
+    parser.add_argument("-o", "--out-dir", type=str, default=".", help="Папка для JSON")
+    parser.add_argument("--provider", choices=("gemini", "groq", "openai", "local"), default="groq", help="Провайдер LLM")
+    parser.add_argument("--concurrency", type=int,
+                        help="Одновременных запросов к провайдеру (по умолчанию из config)")
+    parser.add_argument("--prompt", type=str, help="Файл с промптом")
+    parser.add_argument("--no-cache", action="store_true", help="Не брать ответы из кэша")
+    args = parser.parse_args()
+
+    files = find_lab_files(args.folder)
+    if not files:
+        print(f"Методички не найдены в {args.folder}")
+        return 1
+    started = time.perf_counter()
+    results = asyncio.run(generate_all(
+        files,
+        output_dir=args.out_dir,
+        provider=args.provider,
+        concurrency=args.concurrency,
+        prompt_file=args.prompt,
+        use_cache=not args.no_cache,
+    ))
+    print_summary(results, time.perf_counter() - started)
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
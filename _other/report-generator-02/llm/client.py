@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 """Клиент для работы с различными LLM API."""
 import json
-from typing import Optional, Dict, Any, Tuple
+import time
+from typing import Optional, Dict, Any, Tuple, Callable, Iterator
 from enum import Enum
-from ..config import get_api_key
+from ..config import LLM_TEXT_MAX_TOKENS, LLM_TIMEOUT, LOCAL_LLM_URL, get_api_key
+from .compaction import clean_text, compact_text, count_tokens
+from .json_stream import IncrementalJSONParser, iter_sections
+from .request import call_with_retry, text_token_budget
+from .response_cache import get_response_cache
+from .text_extractor import guess_lab_info
 
 
 class LLMProvider(Enum):
@@ -11,15 +17,55 @@ class LLMProvider(Enum):
     GEMINI = "gemini"
     GROQ = "groq"
     OPENAI = "openai"  # для совместимости
+    LOCAL = "local"  # локальный OpenAI-совместимый сервер (fake_server) для замеров
+
+
+# Модели провайдеров (входят в ключ кэша ответов)
+MODELS = {
+    LLMProvider.GEMINI: "gemini-2.0-flash-exp",
+    LLMProvider.GROQ: "llama-3.3-70b-versatile",
+    LLMProvider.OPENAI: "gpt-4o-mini",  # более дешёвая модель
+    LLMProvider.LOCAL: "local-replay",
+}
+
+GENERATION_TEMPERATURE = 0.3
+LAB_INFO_TEMPERATURE = 0.1
+
+
+def lab_json_errors(data: Any) -> list:
+    """Список проблем в JSON отчёта (пустой — JSON годится для шаблона)."""
+    if not isinstance(data, dict):
+        return ["ответ не является объектом JSON"]
+    errors = []
+    lab = data.get("lab")
+    if not isinstance(lab, dict) or "number" not in lab or "theme" not in lab:
+        errors.append("нет lab.number или lab.theme")
+    procedure = data.get("procedure")
+    if not isinstance(procedure, list) or not procedure:
+        errors.append("procedure должен быть непустым списком")
+    elif not all(isinstance(step, dict) and "text" in step for step in procedure):
+        errors.append("у шага procedure нет поля text")
+    for field in ("goals", "conclusion"):
+        if not isinstance(data.get(field), str):
+            errors.append(f"нет поля {field}")
+    if not isinstance(data.get("questions", []), list):
+        errors.append("questions должен быть списком")
+    return errors
 
 
 class LLMClient:
     """Универсальный клиент для работы с LLM API."""
     
-    def __init__(self, provider: LLMProvider = LLMProvider.GEMINI, api_key: Optional[str] = None):
+    def __init__(self, provider: LLMProvider = LLMProvider.GEMINI, api_key: Optional[str] = None,
+                 use_cache: bool = True, timeout: float = LLM_TIMEOUT):
         self.provider = provider
+        self.timeout = timeout
+        # Замеры последнего потокового ответа: ttft, seconds, tokens, tokens_per_second
+        self.last_stream_stats = None
+        self.model = MODELS.get(provider)
         # Используем переданный ключ, или из config, или None
         self.api_key = api_key or get_api_key(provider.value)
+        self.cache = get_response_cache() if use_cache else None
         self.client = self._init_client()
     
     def _init_client(self):
@@ -30,7 +76,7 @@ class LLMClient:
                 if not self.api_key:
                     raise ValueError("GEMINI_API_KEY не установлен. Получите ключ на https://ai.google.dev/")
                 genai.configure(api_key=self.api_key)
-                return genai.GenerativeModel('gemini-2.0-flash-exp')
+                return genai.GenerativeModel(self.model)
             except ImportError:
                 raise ImportError("Установите google-generativeai: pip install google-generativeai")
         
@@ -39,7 +85,8 @@ class LLMClient:
                 from groq import Groq
                 if not self.api_key:
                     raise ValueError("GROQ_API_KEY не установлен. Получите ключ на https://console.groq.com/")
-                return Groq(api_key=self.api_key)
+                # Повторы делает call_with_retry, встроенные в SDK отключаем
+                return Groq(api_key=self.api_key, max_retries=0)
             except ImportError:
                 raise ImportError("Установите groq: pip install groq")
         
@@ -48,16 +95,46 @@ class LLMClient:
                 from openai import OpenAI
                 if not self.api_key:
                     raise ValueError("OPENAI_API_KEY не установлен")
-                return OpenAI(api_key=self.api_key)
+                return OpenAI(api_key=self.api_key, max_retries=0)
             except ImportError:
                 raise ImportError("Установите openai: pip install openai")
         
+        elif self.provider == LLMProvider.LOCAL:
+            from .local_client import LocalChatClient
+            return LocalChatClient(LOCAL_LLM_URL, self.api_key)
+        
         else:
             raise ValueError(f"Неподдерживаемый провайдер: {self.provider}")
     
+    def _request(self, request, prompt_text: str = ""):
+        """
+        Вызов API через общий слой: лимиты провайдера, повторы временных
+        ошибок и общий дедлайн self.timeout. request получает оставшееся время.
+        """
+        return call_with_retry(request, self.provider.value, self.timeout, tokens=count_tokens(prompt_text))
+
+    def _cached(self, temperature, system_prompt: str, user_prompt: str, request, is_valid):
+        """
+        Ответ из кэша или request() с сохранением результата.
+        В кэш попадает только результат, прошедший проверку is_valid.
+        """
+        if self.cache is None:
+            return request()
+        key = self.cache.make_key(self.provider.value, self.model, temperature, system_prompt, user_prompt)
+        result = self.cache.get(key)
+        if result is not None:
+            print("✅ Ответ взят из кэша")
+            return result
+        result = request()
+        if is_valid(result):
+            self.cache.put(key, result, provider=self.provider.value, model=self.model)
+        return result
+
     def extract_lab_info(self, lab_text: str) -> Tuple[Optional[int], Optional[str]]:
         """
-        Извлекает номер и тему лабораторной работы из текста методички.
+        Извлекает номер и тему лабораторной работы из текста методички
+        отдельным запросом к LLM. generate_json_from_text его больше не
+        вызывает (см. guess_lab_info), метод оставлен для внешнего кода.
         
         Args:
             lab_text: текст методички
@@ -73,22 +150,26 @@ class LLMClient:
 {{"number": <номер или null>, "theme": "<тема или null>"}}
 
 Текст методички:
-{lab_text[:2000]}"""
+{clean_text(lab_text)[0][:2000]}"""
 
-        try:
+        def request():
             if self.provider == LLMProvider.GEMINI:
-                response = self.client.generate_content(prompt)
+                response = self._request(
+                    lambda timeout: self.client.generate_content(prompt, request_options={"timeout": timeout}),
+                    prompt,
+                )
                 text = response.text.strip()
-            elif self.provider == LLMProvider.GROQ:
-                response = self.client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
+            elif self.provider in (LLMProvider.GROQ, LLMProvider.LOCAL):
+                response = self._request(lambda timeout: self.client.chat.completions.create(
+                    model=self.model,
                     messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1,
-                    response_format={"type": "json_object"}
-                )
+                    temperature=LAB_INFO_TEMPERATURE,
+                    response_format={"type": "json_object"},
+                    timeout=timeout,
+                ), prompt)
                 text = response.choices[0].message.content.strip()
             else:
-                return None, None
+                return None
             
             # Убираем markdown разметку если есть
             if text.startswith("```json"):
@@ -99,7 +180,12 @@ class LLMClient:
                 text = text[:-3]
             text = text.strip()
             
-            data = json.loads(text)
+            return json.loads(text)
+
+        try:
+            data = self._cached(LAB_INFO_TEMPERATURE, "", prompt, request, lambda d: isinstance(d, dict))
+            if not isinstance(data, dict):
+                return None, None
             lab_number = data.get("number")
             lab_theme = data.get("theme")
             
@@ -122,6 +208,8 @@ class LLMClient:
         lab_prompt: str,
         lab_number: Optional[int] = None,
         lab_theme: Optional[str] = None,
+        on_section: Optional[Callable[[tuple, Any], None]] = None,
+        max_tokens: Optional[int] = LLM_TEXT_MAX_TOKENS,
     ) -> Dict[str, Any]:
         """
         Генерирует JSON отчёта из текста методички.
@@ -131,17 +219,25 @@ class LLMClient:
             lab_prompt: промпт с инструкциями по форматированию
             lab_number: номер лабораторной работы (опционально, если None - извлекается из текста)
             lab_theme: тема лабораторной работы (опционально, если None - извлекается из текста)
+            on_section: если задан, ответ запрашивается потоком, и для каждого
+                готового раздела вызывается on_section(путь, значение), например
+                (("goals",), "...") или (("procedure", 0), {...}); для ответа
+                из кэша разделы передаются сразу
+            max_tokens: бюджет токенов на текст методички (None — без урезания);
+                у провайдеров с лимитом tokens_per_minute он не больше квоты
+                за вычетом промпта и ответа; колонтитулы, номера страниц и
+                повторы убираются всегда
         
         Returns:
             Словарь с данными отчёта в формате JSON
         """
-        # Если номер или тема не указаны, пытаемся извлечь из текста
+        # Если номер или тема не указаны, ищем их в заголовке методички
         if lab_number is None or lab_theme is None:
-            extracted_number, extracted_theme = self.extract_lab_info(lab_text)
+            guessed_number, guessed_theme = guess_lab_info(text=lab_text)
             if lab_number is None:
-                lab_number = extracted_number
+                lab_number = guessed_number
             if lab_theme is None:
-                lab_theme = extracted_theme
+                lab_theme = guessed_theme
         
         # Формируем полный промпт
         lab_info = ""
@@ -149,6 +245,9 @@ class LLMClient:
             lab_info += f"Номер лабораторной работы: {lab_number}\n"
         if lab_theme:
             lab_info += f"Тема: {lab_theme}\n"
+        if not lab_number or not lab_theme:
+            # Отдельный запрос extract_lab_info не нужен: модель заполнит поле lab сама
+            lab_info += "Номер и тему, которые не указаны, определи по тексту методички и запиши в поле lab.\n"
         
         system_prompt = f"""Ты помощник для генерации отчётов по лабораторным работам.
 Твоя задача — проанализировать текст методички и создать структурированный JSON отчёт.
@@ -168,26 +267,121 @@ JSON должен содержать следующие поля:
 Если номер лабы указан выше, используй его. Если тема указана, используй её.
 Все поля обязательны, кроме questions (может быть пустым массивом [])."""
 
-        user_prompt = f"""Текст методички лабораторной работы:
+        user_template = """Текст методички лабораторной работы:
 
-{lab_text}
+{text}
 
 Создай JSON отчёт по этой методичке, следуя инструкциям выше."""
 
+        # Бюджет не больше минутной квоты провайдера за вычетом промпта и ответа
+        budget = text_token_budget(self.provider.value, max_tokens,
+                                   count_tokens(system_prompt + user_template))
+        if budget != max_tokens:
+            print(f"📏 Бюджет текста {budget} токенов вместо {max_tokens or 'без ограничения'}: "
+                  f"лимит {self.provider.value} в минуту (LLM_TEXT_FIT_RATE_LIMIT в config)")
+        lab_text, stats = compact_text(lab_text, budget)
+        print(f"📉 Текст методички: {stats['tokens_before']} → {stats['tokens_after']} токенов "
+              f"(убрано строк: {stats['removed_lines']}, повторов: {stats['removed_paragraphs']})")
+        user_prompt = user_template.format(text=lab_text)
+
         if self.provider == LLMProvider.GEMINI:
-            return self._generate_with_gemini(system_prompt, user_prompt)
+            generate = self._generate_with_gemini
         elif self.provider == LLMProvider.GROQ:
-            return self._generate_with_groq(system_prompt, user_prompt)
-        elif self.provider == LLMProvider.OPENAI:
-            return self._generate_with_openai(system_prompt, user_prompt)
+            generate = self._generate_with_groq
+        elif self.provider in (LLMProvider.OPENAI, LLMProvider.LOCAL):
+            generate = self._generate_with_openai
         else:
             raise ValueError(f"Генерация для {self.provider} не реализована")
+
+        def is_valid(result):
+            errors = lab_json_errors(result)
+            if errors:
+                print(f"⚠️ Ответ не сохранён в кэш: {'; '.join(errors)}")
+            return not errors
+
+        streamed = []
+
+        def request():
+            if on_section is None:
+                return generate(system_prompt, user_prompt)
+            streamed.append(True)
+            return self._generate_streaming(system_prompt, user_prompt, on_section)
+
+        result = self._cached(GENERATION_TEMPERATURE, system_prompt, user_prompt, request, is_valid)
+        if on_section is not None and not streamed:
+            for path, value in iter_sections(result):
+                on_section(path, value)
+        return result
+
+    def _stream_chunks(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """Куски текста ответа по мере генерации (stream=True в SDK)."""
+        if self.provider == LLMProvider.GEMINI:
+            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+            response = self._request(
+                lambda timeout: self.client.generate_content(
+                    full_prompt, stream=True, request_options={"timeout": timeout},
+                ),
+                full_prompt,
+            )
+            for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
+        else:
+            stream = self._request(lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=GENERATION_TEMPERATURE,
+                response_format={"type": "json_object"},
+                stream=True,
+                timeout=timeout,
+            ), system_prompt + user_prompt)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def _generate_streaming(self, system_prompt: str, user_prompt: str,
+                            on_section: Callable[[tuple, Any], None]) -> Dict[str, Any]:
+        """
+        Потоковая генерация: разделы JSON передаются в on_section по мере
+        закрытия. Время до первого токена и скорость — в self.last_stream_stats.
+        """
+        parser = IncrementalJSONParser()
+        started = time.perf_counter()
+        first_token = None
+        try:
+            for piece in self._stream_chunks(system_prompt, user_prompt):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                for path, value in parser.feed(piece):
+                    on_section(path, value)
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при потоковом запросе к {self.provider.value}: {e}")
+
+        seconds = time.perf_counter() - started
+        tokens = count_tokens(parser.text)
+        generating = seconds - (first_token or 0.0)
+        self.last_stream_stats = {
+            "ttft": first_token,
+            "seconds": seconds,
+            "tokens": tokens,
+            "tokens_per_second": tokens / generating if generating > 0 else 0.0,
+        }
+        try:
+            return parser.result()
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Не удалось распарсить JSON от {self.provider.value}: {e}\nОтвет: {parser.text[:500]}")
     
     def _generate_with_gemini(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """Генерация через Gemini API."""
         try:
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
-            response = self.client.generate_content(full_prompt)
+            response = self._request(
+                lambda timeout: self.client.generate_content(full_prompt, request_options={"timeout": timeout}),
+                full_prompt,
+            )
             text = response.text.strip()
             
             # Убираем markdown разметку если есть
@@ -208,15 +402,16 @@ JSON должен содержать следующие поля:
     def _generate_with_groq(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """Генерация через Groq API."""
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            response = self._request(lambda timeout: self.client.chat.completions.create(
+                model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
+                temperature=GENERATION_TEMPERATURE,
+                response_format={"type": "json_object"},
+                timeout=timeout,
+            ), system_prompt + user_prompt)
             text = response.choices[0].message.content.strip()
             return json.loads(text)
         except json.JSONDecodeError as e:
@@ -228,15 +423,16 @@ JSON должен содержать следующие поля:
     def _generate_with_openai(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """Генерация через OpenAI API."""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # более дешёвая модель
+            response = self._request(lambda timeout: self.client.chat.completions.create(
+                model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
+                temperature=GENERATION_TEMPERATURE,
+                response_format={"type": "json_object"},
+                timeout=timeout,
+            ), system_prompt + user_prompt)
             text = response.choices[0].message.content.strip()
             return json.loads(text)
         except json.JSONDecodeError as e:
@@ -246,12 +442,14 @@ JSON должен содержать следующие поля:
             raise RuntimeError(f"Ошибка при запросе к OpenAI API: {e}")
 
 
-def create_client(provider_name: str = "gemini", api_key: Optional[str] = None) -> LLMClient:
+def create_client(provider_name: str = "gemini", api_key: Optional[str] = None,
+                  use_cache: bool = True) -> LLMClient:
     """Создаёт клиент для указанного провайдера."""
     provider_map = {
         "gemini": LLMProvider.GEMINI,
         "groq": LLMProvider.GROQ,
         "openai": LLMProvider.OPENAI,
+        "local": LLMProvider.LOCAL,
     }
     provider = provider_map.get(provider_name.lower(), LLMProvider.GEMINI)
-    return LLMClient(provider=provider, api_key=api_key)
+    return LLMClient(provider=provider, api_key=api_key, use_cache=use_cache)
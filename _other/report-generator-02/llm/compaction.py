@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Сжатие текста методички перед отправкой в LLM."""
+import re
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+
+# Строка, повторяющаяся не реже стольких раз и не чаще раза на ~полстраницы,
+# считается колонтитулом
+HEADER_MIN_REPEATS = 3
+HEADER_MIN_GAP = 1000
+HEADER_MAX_LENGTH = 100
+# Короче — не считаем абзац дубликатом ("Решение", "Пример:")
+DUPLICATE_MIN_LENGTH = 40
+
+# Разделы, которые при урезании по бюджету сохраняются целиком
+KEEP_SECTIONS = re.compile(
+    r"^(?:\d+[.)]?\s*)?(?:задани|практическ|порядок выполнения|ход работы|самостоятельн|"
+    r"контрольные вопросы|вопросы|упражнени)",
+    re.IGNORECASE,
+)
+
+_PAGE_NUMBER = re.compile(r"^\s*(?:стр\.?|страница|page)?\s*\d{1,4}\s*(?:из\s*\d{1,4})?\s*$", re.IGNORECASE)
+_DOT_LEADER = re.compile(r"(?:\.\s*){4,}")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """Число токенов: tiktoken (cl100k_base), если установлен, иначе ≈4 символа на токен."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _normalize(line: str) -> str:
+    """Ключ для сравнения строк: без пробелов по краям, цифры обезличены."""
+    return re.sub(r"\d+", "#", " ".join(line.split())).lower()
+
+
+def _repeated_lines(lines: List[str]) -> set:
+    """Ключи коротких строк, которые встречаются регулярно по всему тексту (колонтитулы)."""
+    positions = defaultdict(list)
+    offset = 0
+    for line in lines:
+        key = _normalize(line)
+        if key and len(key) <= HEADER_MAX_LENGTH:
+            positions[key].append(offset)
+        offset += len(line) + 1
+    repeated = set()
+    for key, found in positions.items():
+        if len(found) < HEADER_MIN_REPEATS:
+            continue
+        gaps = [b - a for a, b in zip(found, found[1:])]
+        if min(gaps) >= HEADER_MIN_GAP:
+            repeated.add(key)
+    return repeated
+
+
+def clean_text(text: str) -> Tuple[str, dict]:
+    """
+    Убирает шум без потери смысла: колонтитулы и номера страниц,
+    точки-заполнители оглавления, лишние пробелы и пустые строки,
+    повторяющиеся абзацы. Возвращает (текст, счётчики удалённого).
+    """
+    lines = text.splitlines()
+    headers = _repeated_lines(lines)
+    kept = []
+    removed_lines = 0
+    for line in lines:
+        if _PAGE_NUMBER.match(line) or (line.strip() and _normalize(line) in headers):
+            removed_lines += 1
+            continue
+        line = _DOT_LEADER.sub(" … ", line)
+        kept.append(_SPACES.sub(" ", line).strip())
+
+    paragraphs = []
+    seen = set()
+    removed_paragraphs = 0
+    for paragraph in re.split(r"\n\s*\n", "\n".join(kept)):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        key = _normalize(paragraph)
+        if len(key) >= DUPLICATE_MIN_LENGTH and key in seen:
+            removed_paragraphs += 1
+            continue
+        seen.add(key)
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs), {"removed_lines": removed_lines, "removed_paragraphs": removed_paragraphs}
+
+
+def _split_sections(text: str) -> List[Tuple[bool, str]]:
+    """
+    Делит текст по заголовкам KEEP_SECTIONS: [(сохранять_целиком, текст)].
+    Сохраняемый раздел длится до конца текста — в методичках задания и
+    вопросы идут после теории.
+    """
+    sections = []
+    current, keep = [], False
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped and len(stripped) <= HEADER_MAX_LENGTH and KEEP_SECTIONS.match(stripped):
+            if current:
+                sections.append((keep, "\n".join(current)))
+            current, keep = [], True
+        current.append(line)
+    if current:
+        sections.append((keep, "\n".join(current)))
+    return sections
+
+
+def _cut(text: str, max_tokens: int) -> str:
+    """Начало текста не длиннее max_tokens, обрезанное по границе слова."""
+    end = int(len(text) * max_tokens / max(count_tokens(text), 1))
+    while end > 0:
+        cut = text[:end]
+        space = cut.rfind(" ", end // 2)
+        if space > 0 and end < len(text):
+            cut = cut[:space]
+        if count_tokens(cut) <= max_tokens:
+            return cut.rstrip()
+        end = int(end * 0.9)  # оценка по пропорции промахнулась — подрезаем ещё
+    return ""
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """
+    Первые абзацы текста, укладывающиеся в max_tokens; абзац, который
+    не влез целиком, обрезается по остатку бюджета.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept, used = [], 0
+    for paragraph in text.split("\n\n"):
+        cost = count_tokens(paragraph) + 1
+        if used + cost > max_tokens:
+            # Маркер «[…]» тоже занимает токены
+            rest = _cut(paragraph, max_tokens - used - count_tokens(" […]") - 1)
+            if rest:
+                kept.append(rest + " […]")
+            else:
+                kept.append("[…]")
+            break
+        kept.append(paragraph)
+        used += cost
+    return "\n\n".join(kept)
+
+
+def fit_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Укладывает текст в max_tokens. Разделы с заданием и вопросами
+    (KEEP_SECTIONS) сохраняются целиком, остальные (теория) урезаются
+    пропорционально размеру, с начала каждого раздела.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    sections = _split_sections(text)
+    kept_tokens = sum(count_tokens(body) for keep, body in sections if keep)
+    if kept_tokens >= max_tokens:
+        # Даже задания не влезают — урезаем всё пропорционально
+        sections = [(False, body) for _, body in sections]
+        kept_tokens = 0
+    other_tokens = sum(count_tokens(body) for keep, body in sections if not keep)
+    share = (max_tokens - kept_tokens) / max(other_tokens, 1)
+    parts = []
+    for keep, body in sections:
+        part = body if keep else _truncate(body, int(count_tokens(body) * share))
+        if part:
+            parts.append(part)
+    return "\n\n".join(parts)
+
+
+def compact_text(text: str, max_tokens: Optional[int] = None) -> Tuple[str, dict]:
+    """
+    Готовит текст методички для промпта: clean_text, затем fit_to_budget.
+    Возвращает (текст, статистика) — tokens_before, tokens_after и
+    счётчики удалённых строк и абзацев.
+    """
+    tokens_before = count_tokens(text)
+    cleaned, stats = clean_text(text)
+    if max_tokens is not None:  # 0 — бюджет исчерпан промптом, а не «без ограничения»
+        cleaned = fit_to_budget(cleaned, max_tokens)
+    stats.update(tokens_before=tokens_before, tokens_after=count_tokens(cleaned))
+    return cleaned, stats
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная замена LLM-провайдера для замеров без сети.
+
+HTTP-сервер с OpenAI-совместимым POST /v1/chat/completions (обычный ответ
+и stream=True). Отдаёт записанные ответы — JSON из кэша ответов или папки
+с *.json — с настраиваемой задержкой, разбросом, долей ошибок 500 и
+ответов 429 с Retry-After.
+
+    python -m report_generator.llm.fake_server --latency 2 --jitter 0.5 --rate-limit 0.1
+    python -m report_generator.llm.generator ЛР5.pdf --provider local
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from ..config import LOCAL_LLM_URL, RESPONSE_CACHE_DIR
+
+
+SAMPLE_RESPONSE = {
+    "lab": {"number": 0, "discipline": "Операционные системы", "theme": "Тестовая лабораторная"},
+    "goals": "Проверить конвейер генерации без обращения к внешнему API.",
+    "procedure": [
+        {"text": f"Шаг {n}: выполнить команду, как показано на рисунке {n}.",
+         "images": [{"number": n, "src": f"images/{n}.png", "caption": f"Результат шага {n}"}]}
+        for n in range(1, 6)
+    ],
+    "questions": [{"question": "Что проверяет этот ответ?", "answer": "Работу локального сервера."}],
+    "conclusion": "Конвейер работает без сети.",
+}
+
+
+def load_recorded_responses(folder) -> List[str]:
+    """
+    Тексты ответов из папки: файлы кэша ответов (.bin, поле result)
+    или обычные *.json с готовым JSON отчёта.
+    """
+    responses = []
+    if not folder or not os.path.isdir(folder):
+        return responses
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not name.endswith((".bin", ".json")):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if name.endswith(".bin"):
+            data = data.get("result")
+        if isinstance(data, dict) and "procedure" in data:
+            responses.append(json.dumps(data, ensure_ascii=False))
+    return responses
+
+
+class FakeLLM:
+    """Поведение сервера: что отвечать, с какой задержкой и как часто ошибаться."""
+
+    def __init__(self, responses: List[str], latency: float = 1.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit: float = 0.0, retry_after: float = 1.0,
+                 tokens_per_second: float = 200.0, seed: Optional[int] = None):
+        self.responses = responses or [json.dumps(SAMPLE_RESPONSE, ensure_ascii=False)]
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.tokens_per_second = tokens_per_second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def roll(self) -> Optional[int]:
+        """Какую ошибку изобразить: 429, 500 или None."""
+        with self._lock:
+            value = self._random.random()
+        if value < self.rate_limit:
+            return 429
+        if value < self.rate_limit + self.error_rate:
+            return 500
+        return None
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self._random.gauss(self.latency, self.jitter) if self.jitter else self.latency)
+
+    def pick(self, messages) -> str:
+        """Один и тот же промпт — один и тот же записанный ответ."""
+        prompt = json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        index = int(hashlib.sha256(prompt).hexdigest(), 16) % len(self.responses)
+        return self.responses[index]
+
+
+def make_handler(fake: FakeLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # без строки в консоль на каждый запрос
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, fake.counters)
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length).decode("utf-8"))
+            except ValueError:
+                self._send_json(400, {"error": {"message": "invalid JSON"}})
+                return
+            fake.count("requests")
+
+            error = fake.roll()
+            if error == 429:
+                fake.count("rate_limited")
+                self._send_json(429, {"error": {"message": "rate limit exceeded"}},
+                                {"Retry-After": f"{fake.retry_after:g}"})
+                return
+            time.sleep(fake.delay())
+            if error == 500:
+                fake.count("errors")
+                self._send_json(500, {"error": {"message": "injected server error"}})
+                return
+
+            content = fake.pick(request.get("messages", []))
+            model = request.get("model", "local-replay")
+            if request.get("stream"):
+                self._stream(content, model)
+            else:
+                self._send_json(200, {
+                    "id": "local", "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"completion_tokens": len(content) // 4 + 1},
+                })
+            fake.count("ok")
+
+        def _stream(self, content, model):
+            """Отдаёт ответ кусками ~по 4 символа (≈1 токен) со скоростью tokens_per_second."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pause = 1.0 / fake.tokens_per_second if fake.tokens_per_second else 0.0
+            for start in range(0, len(content), 4):
+                chunk = {"id": "local", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": content[start:start + 4]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if pause:
+                    time.sleep(pause)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+def start_server(fake: FakeLLM, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Запускает сервер в фоновом потоке (для замеров из кода). Остановка — server.shutdown()."""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    default_port = int(LOCAL_LLM_URL.rsplit(":", 1)[1].split("/")[0])
+    parser = argparse.ArgumentParser(description="Локальный OpenAI-совместимый сервер с записанными ответами")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--responses", default=str(RESPONSE_CACHE_DIR),
+                        help="Папка с ответами: кэш ответов или *.json (по умолчанию кэш ответов)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Разброс задержки (σ), с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After для 429, с")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Скорость потокового ответа")
+    parser.add_argument("--seed", type=int, help="Зерно генератора случайных чисел")
+    args = parser.parse_args()
+
+    responses = load_recorded_responses(args.responses)
+    fake = FakeLLM(responses, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                   rate_limit=args.rate_limit, retry_after=args.retry_after,
+                   tokens_per_second=args.tokens_per_second, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    server.daemon_threads = True
+    source = f"{len(responses)} записанных ответов" if responses else "встроенный пример ответа"
+    print(f"Локальный LLM: http://{args.host}:{args.port}/v1 ({source}). Ctrl+C — выход.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Статистика: {fake.counters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 """Генерация JSON отчёта из методички через LLM."""
+import argparse
 import json
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
 from .client import create_client, LLMProvider
-from .text_extractor import extract_text_from_file, load_lab_prompt
+from .text_cache import extract_text_cached
+from .text_extractor import guess_lab_info, load_lab_prompt
 
 
 def generate_lab_json(
@@ -16,6 +18,9 @@ def generate_lab_json(
     provider: str = "groq",
     api_key: Optional[str] = None,
     prompt_file: Optional[str] = None,
+    pages: Optional[str] = None,
+    use_cache: bool = True,
+    on_section: Optional[Callable[[tuple, Any], None]] = None,
 ) -> dict:
     """
     Генерирует JSON отчёт из файла методички.
@@ -25,16 +30,27 @@ def generate_lab_json(
         output_json_path: путь для сохранения JSON (если None, создаётся рядом с исходным файлом)
         lab_number: номер лабораторной работы (если None, извлекается из текста)
         lab_theme: тема лабораторной работы (если None, извлекается из текста)
-        provider: провайдер LLM ("gemini", "groq", "openai")
+        provider: провайдер LLM ("gemini", "groq", "openai", "local")
         api_key: API ключ (если None, берётся из config)
         prompt_file: путь к файлу с промптом (если None, используется по умолчанию)
+        pages: страницы PDF, например "1-3,7" (если None, берутся все)
+        use_cache: брать ответ LLM из локального кэша, если такой запрос уже был
+        on_section: получать ответ потоком и вызывать on_section(путь, значение)
+            для каждого готового раздела (см. LLMClient.generate_json_from_text)
     
     Returns:
         Словарь с данными отчёта
     """
     print(f"📄 Извлечение текста из {lab_file_path}...")
-    lab_text = extract_text_from_file(lab_file_path)
+    lab_text = extract_text_cached(lab_file_path, pages=pages)
     print(f"✅ Извлечено {len(lab_text)} символов")
+
+    if lab_number is None or lab_theme is None:
+        guessed_number, guessed_theme = guess_lab_info(lab_file_path, lab_text)
+        lab_number = lab_number if lab_number is not None else guessed_number
+        lab_theme = lab_theme or guessed_theme
+        if guessed_number is not None or guessed_theme:
+            print(f"🔎 Лабораторная №{lab_number}: {lab_theme}")
     
     print(f"📝 Загрузка промпта...")
     lab_prompt = load_lab_prompt(prompt_file)
@@ -47,7 +63,7 @@ def generate_lab_json(
 
     path.write_text(lab_prompt, encoding="utf-8")
 
-    client = create_client(provider, api_key)
+    client = create_client(provider, api_key, use_cache=use_cache)
     
     # Номер и тема будут автоматически извлечены из текста, если не указаны
     # Это происходит внутри generate_json_from_text
@@ -58,8 +74,13 @@ def generate_lab_json(
             lab_prompt=lab_prompt,
             lab_number=lab_number,
             lab_theme=lab_theme,
+            on_section=on_section,
         )
         print("✅ JSON успешно сгенерирован")
+        stats = client.last_stream_stats
+        if stats and stats["ttft"] is not None:
+            print(f"⏱ Первый токен через {stats['ttft']:.1f} с, ≈{stats['tokens']} токенов "
+                  f"за {stats['seconds']:.1f} с ({stats['tokens_per_second']:.0f} ток/с)")
         
         # Сохраняем результат
         if output_json_path:
@@ -73,3 +94,56 @@ def generate_lab_json(
     except Exception as e:
         print(f"❌ Ошибка генерации: {e}")
         raise
+
+
+SECTION_NAMES = {
+    "lab": "номер и тема",
+    "goals": "цель работы",
+    "procedure": "ход работы",
+    "questions": "контрольные вопросы",
+    "conclusion": "вывод",
+}
+
+
+def describe_section(path: tuple) -> str:
+    """Подпись раздела для прогресса: ("procedure", 2) → "шаг 3"."""
+    if len(path) == 2 and path[0] == "procedure":
+        return f"шаг {path[1] + 1}"
+    if len(path) == 2 and path[0] == "questions":
+        return f"вопрос {path[1] + 1}"
+    return SECTION_NAMES.get(path[0], str(path[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация JSON отчёта из методички через LLM")
+    parser.add_argument("file", help="Файл методички (PDF, TXT, MD)")
+    parser.add_argument("-o", "--output", type=str, help="Куда сохранить JSON")
+    parser.add_argument("--lab", type=int, help="Номер лабораторной работы")
+    parser.add_argument("--theme", type=str, help="Тема лабораторной работы")
+    parser.add_argument("--provider", choices=("gemini", "groq", "openai", "local"), default="groq", help="Провайдер LLM")
+    parser.add_argument("--prompt", type=str, help="Файл с промптом")
+    parser.add_argument("--pages", type=str, help="Страницы PDF, например 1-3,7")
+    parser.add_argument("--no-cache", action="store_true", help="Не брать ответ из кэша (новый запрос к API)")
+    parser.add_argument("--stream", action="store_true", help="Получать ответ потоком и печатать готовые разделы")
+    args = parser.parse_args()
+
+    def print_section(path, value):
+        if len(path) == 1 and isinstance(value, list):
+            return  # элементы списка уже напечатаны по одному
+        print(f"📥 Готово: {describe_section(path)}")
+
+    generate_lab_json(
+        args.file,
+        output_json_path=args.output,
+        lab_number=args.lab,
+        lab_theme=args.theme,
+        provider=args.provider,
+        prompt_file=args.prompt,
+        pages=args.pages,
+        use_cache=not args.no_cache,
+        on_section=print_section if args.stream else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Инкрементальный разбор JSON, приходящего по кускам (стриминг LLM)."""
+import json
+from typing import Any, Iterator, List, Tuple
+
+
+Section = Tuple[tuple, Any]
+
+
+class IncrementalJSONParser:
+    """
+    Принимает текст ответа кусками и сообщает о разделах, которые уже
+    закрылись: полях верхнего уровня (("goals",), значение) и элементах
+    списков верхнего уровня (("procedure", 2), шаг). Так первые шаги
+    отчёта видны до того, как модель допишет остальное.
+
+    Текст до первой "{" (например, ```json) пропускается.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+
+    def feed(self, chunk: str) -> List[Section]:
+        """Добавляет кусок текста, возвращает разделы, закрывшиеся в нём."""
+        self._buffer += chunk
+        sections = []
+        buf = self._buffer
+        for i in range(self._pos, len(buf)):
+            if self._done:
+                break
+            self._step(buf, i, buf[i], sections)
+        self._pos = len(buf)
+        return sections
+
+    def _step(self, buf, i, c, sections):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._stack[-1]["key"] = json.loads(buf[self._key_start:i + 1])
+                    self._key_start = None
+            return
+        if not self._started:
+            if c == "{":
+                self._started = True
+                self._stack.append(self._frame("{"))
+            return
+        if c in " \t\r\n":
+            return
+
+        frame = self._stack[-1]
+        if c == '"':
+            self._in_string = True
+            if frame["type"] == "{" and frame["state"] == "key":
+                self._key_start = i
+            elif frame["start"] is None:
+                frame["start"] = i
+        elif c == ":":
+            frame["state"] = "value"
+        elif c in "{[":
+            if frame["start"] is None:
+                frame["start"] = i
+            self._stack.append(self._frame(c))
+        elif c in "}]":
+            if frame["start"] is not None:
+                self._close_child(buf, i, sections)
+            self._stack.pop()
+            if not self._stack:
+                self._done = True
+                return
+            self._close_child(buf, i + 1, sections)
+        elif c == ",":
+            if frame["start"] is not None:
+                self._close_child(buf, i, sections)
+            if frame["type"] == "{":
+                frame["state"] = "key"
+        elif frame["start"] is None:
+            frame["start"] = i
+
+    @staticmethod
+    def _frame(kind):
+        return {"type": kind, "state": "key" if kind == "{" else "value", "key": None, "start": None, "index": 0}
+
+    def _close_child(self, buf, end, sections):
+        """Значение в текущем контейнере закончилось на позиции end."""
+        frame = self._stack[-1]
+        depth = len(self._stack)
+        path = None
+        if depth == 1:
+            path = (frame["key"],)
+        elif depth == 2 and frame["type"] == "[":
+            path = (self._stack[0]["key"], frame["index"])
+        if path is not None:
+            try:
+                sections.append((path, json.loads(buf[frame["start"]:end])))
+            except ValueError:
+                pass  # испорченный кусок: целиком его разберёт result()
+        frame["start"] = None
+        if frame["type"] == "[":
+            frame["index"] += 1
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def result(self) -> Any:
+        """Полностью разобранный JSON (ValueError, если он не закрыт или испорчен)."""
+        text = self.text.strip()
+        start = text.find("{")
+        end = text.rfind("}")
+        if start < 0 or end < start:
+            raise json.JSONDecodeError("объект JSON не найден", text, 0)
+        return json.loads(text[start:end + 1])
+
+
+def iter_sections(data: dict) -> Iterator[Section]:
+    """Те же разделы, что выдаёт парсер, но для готового словаря (ответ из кэша)."""
+    for key, value in data.items():
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                yield (key, index), item
+        yield (key,), value
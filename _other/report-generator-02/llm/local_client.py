@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Минимальный клиент OpenAI-совместимого chat completions API на urllib (без SDK)."""
+import json
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from typing import Optional
+
+
+class LocalAPIError(Exception):
+    """Ошибка HTTP от сервера; status_code и response.headers читает слой повторов."""
+
+    def __init__(self, status_code: int, message: str, headers=None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class _Completions:
+    def __init__(self, base_url: str, api_key: Optional[str]):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+
+    def create(self, model, messages, temperature=None, response_format=None, stream=False, timeout=None):
+        """Как client.chat.completions.create в SDK openai/groq."""
+        body = {"model": model, "messages": messages, "stream": stream}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if response_format is not None:
+            body["response_format"] = response_format
+        request = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.api_key or 'local'}",
+            },
+        )
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            raise LocalAPIError(e.code, e.read().decode("utf-8", "replace")[:200], e.headers) from e
+        if stream:
+            return self._iter_stream(response)
+        with response:
+            data = json.loads(response.read().decode("utf-8"))
+        message = SimpleNamespace(content=data["choices"][0]["message"]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=data.get("usage"))
+
+    @staticmethod
+    def _iter_stream(response):
+        """Разбирает server-sent events: строки "data: {...}" до "data: [DONE]"."""
+        with response:
+            for raw in response:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    return
+                data = json.loads(payload)
+                delta = SimpleNamespace(content=data["choices"][0]["delta"].get("content"))
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class LocalChatClient:
+    """Объект с тем же интерфейсом client.chat.completions.create, что у SDK."""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.chat = SimpleNamespace(completions=_Completions(base_url, api_key))
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Общий слой запросов к LLM: дедлайны, повторы с backoff и ограничение частоты."""
+import email.utils
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+from ..config import LLM_MAX_RETRIES, LLM_RATE_LIMITS, LLM_RESPONSE_RESERVE_TOKENS, LLM_TEXT_FIT_RATE_LIMIT
+
+
+T = TypeVar("T")
+
+# HTTP-коды, после которых имеет смысл повторить запрос
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Запрос (с учётом повторов и ожидания лимита) не уложился в срок."""
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate единиц в секунду, не больше capacity за раз.
+    Потокобезопасно — одно ведро на провайдера делят все потоки.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1, deadline: Optional[float] = None):
+        """
+        Забирает amount единиц, при нехватке ждёт. Запрос больше capacity
+        ограничивается capacity, иначе он не выполнился бы никогда.
+        deadline — time.monotonic(), после которого ждать бессмысленно.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise DeadlineExceeded("не дождались лимита запросов до дедлайна")
+            time.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiters(provider: str):
+    """(ведро запросов, ведро токенов) провайдера по LLM_RATE_LIMITS; None — без лимита."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = LLM_RATE_LIMITS.get(provider, {})
+            rpm = limits.get("requests_per_minute")
+            tpm = limits.get("tokens_per_minute")
+            _limiters[provider] = (
+                TokenBucket(rpm / 60, rpm) if rpm else None,
+                TokenBucket(tpm / 60, tpm) if tpm else None,
+            )
+        return _limiters[provider]
+
+
+def text_token_budget(provider: str, max_tokens: Optional[int], prompt_tokens: int = 0) -> Optional[int]:
+    """
+    Бюджет на текст методички с учётом tokens_per_minute провайдера: промпт
+    (prompt_tokens), текст и ответ должны влезать в минутную квоту, иначе
+    провайдер отклонит запрос как слишком большой. None — без урезания.
+    Токены считаются compaction.count_tokens, как и сам текст.
+    Отключается LLM_TEXT_FIT_RATE_LIMIT = False в config.
+    """
+    tpm = LLM_RATE_LIMITS.get(provider, {}).get("tokens_per_minute")
+    if not tpm or not LLM_TEXT_FIT_RATE_LIMIT:
+        return max_tokens
+    limit = max(0, tpm - prompt_tokens - LLM_RESPONSE_RESERVE_TOKENS)
+    return limit if max_tokens is None else min(max_tokens, limit)
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """HTTP-код ошибки SDK (groq/openai — status_code, google — code)."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Временная ли ошибка: 429/5xx, таймаут или обрыв соединения."""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, TimeoutError)) or "Timeout" in name or "Connection" in name
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Секунды из заголовка Retry-After (retry-after-ms, число или HTTP-дата)."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    # Имена заголовков не зависят от регистра, а dict из SDK или теста — зависит
+    headers = {str(name).lower(): value for name, value in headers.items()}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None  # мусор в заголовке не должен подменять исходную ошибку
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def backoff_delay(attempt: int, base: float = BASE_DELAY, cap: float = MAX_DELAY) -> float:
+    """Экспоненциальная задержка с полным джиттером: случайно от 0 до base·2^attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_with_retry(
+    request: Callable[[float], T],
+    provider: str,
+    timeout: float,
+    tokens: int = 0,
+    max_retries: int = LLM_MAX_RETRIES,
+) -> T:
+    """
+    Выполняет request(оставшееся_время) с повторами.
+
+    Перед каждой попыткой ждёт место в лимитах провайдера (запросы и
+    токены). Временные ошибки повторяются с экспоненциальной задержкой
+    и джиттером; если сервер прислал Retry-After, ждём не меньше него.
+    timeout — общий дедлайн на все попытки и ожидания, в секундах.
+    """
+    deadline = time.monotonic() + timeout
+    requests_bucket, tokens_bucket = get_limiters(provider)
+    attempt = 0
+    while True:
+        if requests_bucket:
+            requests_bucket.acquire(1, deadline)
+        if tokens_bucket and tokens:
+            tokens_bucket.acquire(tokens, deadline)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{provider}: истёк срок {timeout:.0f} с")
+        try:
+            return request(remaining)
+        except Exception as e:
+            if not is_retryable(e) or attempt >= max_retries:
+                raise
+            delay = max(backoff_delay(attempt), retry_after(e) or 0.0)
+            if time.monotonic() + delay >= deadline:
+                raise DeadlineExceeded(f"{provider}: истёк срок {timeout:.0f} с, последняя ошибка: {e}") from e
+            code = status_code(e)
+            print(f"⏳ {provider}: {code or type(e).__name__}, повтор {attempt + 1}/{max_retries} через {delay:.1f} с")
+            time.sleep(delay)
+            attempt += 1
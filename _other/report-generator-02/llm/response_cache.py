@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Локальный кэш ответов LLM."""
+import hashlib
+import json
+import time
+from typing import Any, Optional
+from ..config import RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL
+from ..io.disk_cache import DiskCache
+
+
+class ResponseCache:
+    """
+    Кэш уже распарсенных ответов LLM.
+
+    Ключ — провайдер, модель, температура и хэш системного и
+    пользовательского промптов. Записи старше ttl секунд считаются
+    устаревшими (срок отсчитывается от получения ответа, а не от
+    последнего чтения). Размер ограничен так же, как у кэша картинок:
+    LRU по времени использования.
+    """
+
+    def __init__(self, cache_dir, max_bytes=50 * 1024 * 1024, ttl: Optional[float] = 7 * 24 * 3600):
+        self.store = DiskCache(cache_dir, max_bytes=max_bytes, memory_bytes=8 * 1024 * 1024)
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: Optional[float],
+                 system_prompt: str, user_prompt: str) -> str:
+        h = hashlib.sha256()
+        for part in (provider, model, repr(temperature)):
+            h.update(f"{part}|".encode("utf-8"))
+        h.update(hashlib.sha256(system_prompt.encode("utf-8")).digest())
+        h.update(hashlib.sha256(user_prompt.encode("utf-8")).digest())
+        return h.hexdigest()
+
+    def _expired(self, entry: dict) -> bool:
+        return self.ttl is not None and time.time() - entry.get("created", 0) > self.ttl
+
+    @staticmethod
+    def _load(data: bytes) -> Optional[dict]:
+        try:
+            return json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Результат из кэша или None (нет записи или она устарела)."""
+        data = self.store.get(key)
+        entry = self._load(data) if data is not None else None
+        if entry is None or self._expired(entry):
+            return None
+        return entry["result"]
+
+    def put(self, key: str, result: Any, **meta):
+        """Сохраняет результат; meta (провайдер, модель) — для просмотра кэша."""
+        entry = dict(meta, created=time.time(), result=result)
+        self.store.put(key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+
+    def prune_expired(self) -> int:
+        """Удаляет устаревшие записи с диска. Возвращает их число."""
+        if self.ttl is None:
+            return 0
+        return self.store.remove_where(lambda data: self._expired(self._load(data) or {}))
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Общий кэш ответов LLM (None, если кэш отключён в config)."""
+    global _response_cache
+    if _response_cache is None and RESPONSE_CACHE_DIR:
+        _response_cache = ResponseCache(RESPONSE_CACHE_DIR, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                                        ttl=RESPONSE_CACHE_TTL)
+    return _response_cache
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Дисковый кэш текста, извлечённого из методичек."""
+import hashlib
+import json
+import os
+from typing import List, Optional
+from ..config import TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES
+from ..io.disk_cache import DiskCache
+from .text_extractor import (
+    extract_pdf_pages_parallel,
+    extract_text_from_file,
+    join_pdf_pages,
+    parse_page_range,
+    pdf_backend,
+    pdf_page_count,
+)
+
+
+_text_cache = None
+
+
+def get_text_cache():
+    """Общий кэш извлечённого текста (None, если кэш отключён в config)."""
+    global _text_cache
+    if _text_cache is None and TEXT_CACHE_DIR:
+        _text_cache = DiskCache(TEXT_CACHE_DIR, max_bytes=TEXT_CACHE_MAX_BYTES)
+    return _text_cache
+
+
+def _pack(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _unpack(data: bytes):
+    return json.loads(data.decode("utf-8"))
+
+
+def _digest_page_keys(indices: List[int], backend: str, file_digest: str) -> List[str]:
+    """Ключи страниц по хэшу файла и номеру страницы: считаются без разбора PDF."""
+    return [
+        hashlib.sha256(f"page|{backend}|{file_digest}|{i}".encode("ascii")).hexdigest()
+        for i in indices
+    ]
+
+
+def _hash_pdf_object(h, obj, seen):
+    """Добавляет в хэш объект PDF: словари и массивы — рекурсивно, потоки — с данными."""
+    from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        h.update(f"ref{ref}".encode("ascii"))
+        if ref in seen:
+            return
+        seen.add(ref)
+        obj = obj.get_object()
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            if name == "/Parent":
+                continue
+            h.update(f"/{name}".encode("utf-8", "replace"))
+            _hash_pdf_object(h, obj.raw_get(name), seen)
+        if hasattr(obj, "get_data"):
+            h.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            _hash_pdf_object(h, item, seen)
+    else:
+        h.update(repr(obj).encode("utf-8", "replace"))
+
+
+def _content_page_keys(pdf_path: str, indices: List[int], backend: str) -> List[str]:
+    """
+    Ключи страниц PyPDF2 по содержимому: потоки /Contents плюс шрифты
+    (вместе с ToUnicode) и формы из /Resources. Правка одной страницы
+    в конспекте не сбрасывает кэш остальных, а тот же поток с другими
+    шрифтами даёт другой ключ.
+    """
+    import PyPDF2
+    keys = []
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for i in indices:
+            page = reader.pages[i]
+            h = hashlib.sha256(f"page|{backend}|".encode("ascii"))
+            contents = page.get("/Contents")
+            contents = contents.get_object() if contents is not None else []
+            # /Contents — один поток или массив потоков
+            for stream in contents if isinstance(contents, list) else [contents]:
+                h.update(stream.get_object().get_data())
+            resources = page.get("/Resources") or {}
+            seen = set()
+            h.update(b"|fonts|")
+            _hash_pdf_object(h, resources.get("/Font") or {}, seen)
+            h.update(b"|forms|")
+            xobjects = resources.get("/XObject") or {}
+            for name in sorted(xobjects):
+                xobject = xobjects[name]
+                if xobject.get("/Subtype") == "/Form":  # картинки на текст не влияют
+                    h.update(name.encode("utf-8", "replace"))
+                    _hash_pdf_object(h, xobjects.raw_get(name), seen)
+            keys.append(h.hexdigest())
+    return keys
+
+
+def extract_text_cached(file_path: str, pages: Optional[str] = None, jobs: Optional[int] = None,
+                        cache: Optional[DiskCache] = None) -> str:
+    """
+    extract_text_from_file с дисковым кэшем.
+
+    Весь результат кэшируется по хэшу файла, backend и диапазону страниц.
+    Для PDF дополнительно кэшируется каждая страница: сначала по хэшу файла
+    и номеру (без разбора PDF — другой диапазон того же файла), затем, для
+    PyPDF2, по содержимому страницы — после правки методички заново
+    извлекаются только изменённые страницы.
+    """
+    cache = cache or get_text_cache()
+    if cache is None or os.path.splitext(file_path)[1].lower() != ".pdf":
+        return extract_text_from_file(file_path, pages=pages, jobs=jobs)
+
+    backend = pdf_backend()
+    file_key = cache.make_key(file_path, kind="text", backend=backend, pages=pages or "")
+    data = cache.get(file_key)
+    if data is not None:
+        print("✅ Текст взят из кэша")
+        return _unpack(data)
+
+    indices = parse_page_range(pages, pdf_page_count(file_path, backend))
+    digest_keys = dict(zip(indices, _digest_page_keys(indices, backend, DiskCache.file_digest(file_path))))
+    page_texts = {}
+    for index in indices:
+        data = cache.get(digest_keys[index])
+        if data is not None:
+            page_texts[index] = _unpack(data)
+
+    missing = [i for i in indices if i not in page_texts]
+    content_keys = {}
+    if missing and backend == "pypdf2":
+        content_keys = dict(zip(missing, _content_page_keys(file_path, missing, backend)))
+        for index in missing:
+            data = cache.get(content_keys[index])
+            if data is not None:
+                page_texts[index] = _unpack(data)
+                cache.put(digest_keys[index], data)
+        missing = [i for i in missing if i not in page_texts]
+
+    if missing:
+        extracted = extract_pdf_pages_parallel(file_path, missing, backend, jobs)
+        for index, text in zip(missing, extracted):
+            page_texts[index] = text
+            data = _pack(text)
+            cache.put(digest_keys[index], data)
+            if index in content_keys:
+                cache.put(content_keys[index], data)
+    if len(missing) < len(indices):
+        print(f"✅ Страниц из кэша: {len(indices) - len(missing)}, извлечено: {len(missing)}")
+
+    text = join_pdf_pages([page_texts[i] for i in indices], backend)
+    cache.put(file_key, _pack(text))
+    return text
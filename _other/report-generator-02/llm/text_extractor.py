@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
 """Извлечение текста из PDF и других форматов."""
 import os
-from typing import Optional
+import re
+from typing import List, Optional, Tuple
 
 
-def extract_text_from_file(file_path: str) -> str:
+def extract_text_from_file(file_path: str, pages: Optional[str] = None, jobs: Optional[int] = None) -> str:
     """
     Извлекает текст из файла (PDF, TXT, MD).
     
     Args:
         file_path: путь к файлу
+        pages: страницы PDF, например "1-3,7" (None — все)
+        jobs: число процессов для PDF (None — по числу ядер, 1 — последовательно)
     
     Returns:
         Текст из файла
@@ -21,40 +24,184 @@ def extract_text_from_file(file_path: str) -> str:
             return f.read()
     
     elif ext == ".pdf":
-        return extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(file_path, pages=pages, jobs=jobs)
     
     else:
         raise ValueError(f"Неподдерживаемый формат файла: {ext}")
 
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Извлекает текст из PDF файла."""
+# Меньше страниц — быстрее последовательно, чем запускать процессы
+PARALLEL_MIN_PAGES = 8
+
+
+def parse_page_range(spec: Optional[str], page_count: int) -> List[int]:
+    """
+    Разбирает диапазон страниц "1-3,7,10-" (нумерация с 1) в список
+    индексов страниц (с 0). None или пустая строка — все страницы.
+    """
+    if not spec:
+        return list(range(page_count))
+    indices = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else page_count
+        else:
+            first = last = int(part)
+        if first < 1 or last < first:
+            raise ValueError(f"некорректный диапазон страниц: {part}")
+        indices.update(range(first - 1, min(last, page_count)))
+    return sorted(indices)
+
+
+def pdf_backend() -> str:
+    """Доступная библиотека для PDF: "pypdf2" или "pdfplumber"."""
     try:
+        import PyPDF2  # noqa: F401
+        return "pypdf2"
+    except ImportError:
+        pass
+    try:
+        # Альтернатива через pdfplumber (лучше работает с таблицами)
+        import pdfplumber  # noqa: F401
+        return "pdfplumber"
+    except ImportError:
+        raise ImportError(
+            "Для работы с PDF установите одну из библиотек:\n"
+            "  pip install PyPDF2\n"
+            "  или\n"
+            "  pip install pdfplumber"
+        )
+
+
+def pdf_page_count(pdf_path: str, backend: Optional[str] = None) -> int:
+    """Число страниц в PDF."""
+    backend = backend or pdf_backend()
+    if backend == "pypdf2":
+        import PyPDF2
+        with open(pdf_path, "rb") as f:
+            return len(PyPDF2.PdfReader(f).pages)
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_pages(pdf_path: str, indices: List[int], backend: Optional[str] = None) -> List[Optional[str]]:
+    """Текст указанных страниц PDF (файл открывается один раз на весь список)."""
+    backend = backend or pdf_backend()
+    if backend == "pypdf2":
         import PyPDF2
         with open(pdf_path, "rb") as f:
             reader = PyPDF2.PdfReader(f)
-            text_parts = []
-            for page in reader.pages:
-                text_parts.append(page.extract_text())
-            return "\n".join(text_parts)
-    except ImportError:
-        try:
-            # Альтернатива через pdfplumber (лучше работает с таблицами)
-            import pdfplumber
-            text_parts = []
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_parts.append(text)
-            return "\n".join(text_parts)
-        except ImportError:
-            raise ImportError(
-                "Для работы с PDF установите одну из библиотек:\n"
-                "  pip install PyPDF2\n"
-                "  или\n"
-                "  pip install pdfplumber"
-            )
+            return [reader.pages[i].extract_text() for i in indices]
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return [pdf.pages[i].extract_text() for i in indices]
+
+
+def _extract_pages_in_worker(args):
+    """Точка входа для процесса пула: (путь, backend, индексы) → тексты страниц."""
+    pdf_path, backend, indices = args
+    return extract_pdf_pages(pdf_path, indices, backend)
+
+
+def join_pdf_pages(page_texts: List[Optional[str]], backend: str) -> str:
+    """Склеивает тексты страниц так же, как последовательное чтение."""
+    if backend == "pdfplumber":
+        # pdfplumber возвращает None/"" для пустых страниц — их пропускаем
+        page_texts = [text for text in page_texts if text]
+    return "\n".join(page_texts)
+
+
+def extract_pdf_pages_parallel(pdf_path: str, indices: List[int], backend: Optional[str] = None,
+                               jobs: Optional[int] = None) -> List[Optional[str]]:
+    """
+    extract_pdf_pages в пуле процессов: страницы делятся на непрерывные
+    куски, результат возвращается в исходном порядке.
+    """
+    backend = backend or pdf_backend()
+    jobs = jobs or os.cpu_count() or 1
+    jobs = min(jobs, len(indices) // (PARALLEL_MIN_PAGES // 2) or 1)
+    if jobs <= 1 or len(indices) < PARALLEL_MIN_PAGES:
+        return extract_pdf_pages(pdf_path, indices, backend)
+
+    from concurrent.futures import ProcessPoolExecutor
+    chunk_size = -(-len(indices) // jobs)
+    chunks = [indices[i:i + chunk_size] for i in range(0, len(indices), chunk_size)]
+    page_texts = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # map сохраняет порядок кусков
+        for chunk_texts in pool.map(_extract_pages_in_worker, [(pdf_path, backend, c) for c in chunks]):
+            page_texts.extend(chunk_texts)
+    return page_texts
+
+
+def extract_text_from_pdf(pdf_path: str, pages: Optional[str] = None, jobs: Optional[int] = None) -> str:
+    """
+    Извлекает текст из PDF файла.
+
+    Страницы разбираются параллельно (см. extract_pdf_pages_parallel)
+    и склеиваются в исходном порядке — результат совпадает с
+    последовательным чтением.
+
+    Args:
+        pdf_path: путь к PDF
+        pages: диапазон страниц, например "1-3,7" (None — все)
+        jobs: число процессов (None — по числу ядер, 1 — последовательно)
+    """
+    backend = pdf_backend()
+    indices = parse_page_range(pages, pdf_page_count(pdf_path, backend))
+    return join_pdf_pages(extract_pdf_pages_parallel(pdf_path, indices, backend, jobs), backend)
+
+
+# "ЛР5_Работа с правами доступа, ACL.pdf", "lab 3 - FHS.md"
+_FILENAME_LAB = re.compile(r"^(?:ЛР|LR|lab)[\s_№#-]*(\d+)[\s_.-]*(.*)$", re.IGNORECASE)
+# "Лабораторная работа № 5" в начале методички
+_TEXT_LAB = re.compile(r"Лабораторн\w*\s+работ\w*\s*№?\s*(\d+)\.?", re.IGNORECASE)
+_THEME_STOP = ("введение", "цель", "задание", "содержание")
+
+
+def _clean_theme(theme: str) -> Optional[str]:
+    theme = " ".join(theme.split()).strip(" .,_-")
+    return theme or None
+
+
+def guess_lab_info(file_path: Optional[str] = None, text: Optional[str] = None) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Номер и тема лабораторной без обращения к LLM.
+
+    Сначала смотрим заголовок методички ("Лабораторная работа №5" и строки
+    темы до "Введения"), затем имя файла вида "ЛР5_<тема>.pdf".
+    Возвращает (номер, тема); то, что определить не удалось, — None.
+    """
+    number, theme = None, None
+    if text:
+        match = _TEXT_LAB.search(text[:2000])
+        if match:
+            number = int(match.group(1))
+            lines = []
+            for line in text[match.end():].splitlines():
+                line = line.strip()
+                if not line:
+                    if lines:
+                        break
+                    continue
+                if line.lower().startswith(_THEME_STOP) or len(lines) == 3:
+                    break
+                lines.append(line)
+            theme = _clean_theme(" ".join(lines))
+
+    if file_path and (number is None or theme is None):
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        match = _FILENAME_LAB.match(stem)
+        if match:
+            number = number if number is not None else int(match.group(1))
+            theme = theme or _clean_theme(match.group(2))
+    return number, theme
 
 
 def load_lab_prompt(prompt_path: Optional[str] = None) -> str:
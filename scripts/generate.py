@@ -1,11 +1,93 @@
 import json
 import os
 import base64
-from jinja2 import Environment, FileSystemLoader
-from PIL import Image
+import hashlib
 import mimetypes
 import re
 
+JPEG_QUALITY = 85
+
+# Дисковый кэш сжатых картинок: неизменённые скриншоты не пережимаются заново.
+# Ключ — содержимое картинки и параметры сжатия. Размер ограничен
+# IMAGE_CACHE_MAX_BYTES: при переполнении удаляются файлы, которые дольше
+# всех не читались (mtime обновляется при каждом попадании)
+IMAGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "images")
+IMAGE_CACHE_MAX_BYTES = 100 * 1024 * 1024
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def _cache_path(image_path, **params):
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return os.path.join(IMAGE_CACHE_DIR, digest.hexdigest() + '.bin')
+
+
+def _encode_image_cached(image_path, mime_type, max_width):
+    fmt = 'JPEG' if mime_type == 'image/jpeg' else 'PNG'
+    path = _cache_path(image_path, max_width=max_width, format=fmt, quality=JPEG_QUALITY)
+    try:
+        with open(path, 'rb') as f:
+            img_bytes = f.read()
+        os.utime(path)
+        cache_stats["hits"] += 1
+        return img_bytes
+    except OSError:
+        pass
+    img_bytes = _encode_image(image_path, mime_type, max_width)
+    cache_stats["misses"] += 1
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(img_bytes)
+        os.replace(path + '.tmp', path)
+        _prune_cache()
+    except OSError:
+        pass  # без кэша тоже работает
+    return img_bytes
+
+
+def _prune_cache():
+    """Удаляет самые давно использованные файлы, пока кэш больше IMAGE_CACHE_MAX_BYTES."""
+    entries = []
+    with os.scandir(IMAGE_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith('.bin'):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= IMAGE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _encode_image(image_path, mime_type, max_width):
+    from PIL import Image  # Pillow грузим только когда картинку действительно надо сжать
+    with Image.open(image_path) as img:
+        if img.width > max_width:
+            ratio = max_width / img.width
+            new_height = int(img.height * ratio)
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+
+        from io import BytesIO
+        buffer = BytesIO()
+
+        if mime_type == 'image/jpeg' and img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+
+        fmt = 'JPEG' if mime_type == 'image/jpeg' else 'PNG'
+        img.save(buffer, format=fmt, optimize=True, quality=JPEG_QUALITY)
+        return buffer.getvalue()
+
 
 def image_to_base64(image_path, max_width=800):
     """Конвертирует изображение в base64, сжимая до max_width"""
@@ -14,28 +96,31 @@ def image_to_base64(image_path, max_width=800):
         if not mime_type:
             mime_type = 'image/png'
 
-        with Image.open(image_path) as img:
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-            from io import BytesIO
-            buffer = BytesIO()
-
-            if mime_type == 'image/jpeg' and img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-
-            fmt = 'JPEG' if mime_type == 'image/jpeg' else 'PNG'
-            img.save(buffer, format=fmt, optimize=True, quality=85)
-            img_bytes = buffer.getvalue()
-
+        img_bytes = _encode_image_cached(image_path, mime_type, max_width)
         b64 = base64.b64encode(img_bytes).decode('utf-8')
         return f"data:{mime_type};base64,{b64}"
     except Exception as e:
         print(f"❌ Ошибка конвертации {image_path}: {e}")
         return None
 
+# Папка шаблонов → Environment: шаблоны компилируются один раз. Изменённые файлы
+# Jinja2 перечитывает сам (auto_reload), байткод на диске проверяется по исходнику
+TEMPLATE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "templates")
+_environments = {}
+
+
+def get_environment(template_dir):
+    """Environment для папки шаблонов (один на папку)."""
+    if template_dir not in _environments:
+        from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        _environments[template_dir] = Environment(
+            loader=FileSystemLoader(template_dir),
+            bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+        )
+    return _environments[template_dir]
+
+
 def _resolve_image_path(src_value, images_dir):
     """По src из JSON (например '1.png' или 'images/1.png') возвращает путь к файлу в images_dir."""
     if not src_value or not images_dir:
@@ -130,6 +215,8 @@ def generate_report(
         images_dir = os.path.abspath(images_dir)
     processed = process_images_in_data(data, images_dir=images_dir, max_width=max_width)
     print(f"🖼️  Встроено изображений: {processed}")
+    if cache_stats["hits"] or cache_stats["misses"]:
+        print(f"🗄️  Кэш изображений: {cache_stats['hits']} попаданий, {cache_stats['misses']} промахов")
 
     if template_dir is None:
         template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
@@ -138,38 +225,75 @@ def generate_report(
         print(f"❌ Папка шаблонов не найдена: {template_dir}")
         return False
 
-    env = Environment(loader=FileSystemLoader(template_dir))
     try:
-        template = env.get_template('base.html')
+        template = get_environment(template_dir).get_template('base.html')
     except Exception as e:
         print(f"❌ Ошибка загрузки шаблона: {e}")
         return False
 
-    try:
-        html = template.render(**data)
-    except Exception as e:
-        print(f"❌ Ошибка рендеринга: {e}")
-        return False
-
     if not output_file:
         output_file = 'report.html'
     out_dir = os.path.dirname(output_file)
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+
+    # Пишем потоком: куски HTML уходят в файл по мере рендеринга,
+    # весь отчёт (с base64 картинками) не собирается в одну строку
+    tmp_file = output_file + '.tmp'
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+            for chunk in template.generate(**data):
+                f.write(chunk)
+        os.replace(tmp_file, output_file)
+    except Exception as e:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        print(f"❌ Ошибка рендеринга: {e}")
+        return False
 
     size_kb = os.path.getsize(output_file) / 1024
     print(f"✅ Отчёт сохранён: {output_file} ({size_kb:.2f} КБ)")
     return True
 
+def _snapshot(paths):
+    """{файл: (mtime, размер)} для файлов и содержимого папок."""
+    state = {}
+    for path in paths:
+        files = [path] if os.path.isfile(path) else [
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        ]
+        for file in files:
+            try:
+                st = os.stat(file)
+            except OSError:
+                continue
+            state[file] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def watch(paths, rebuild, interval=1.0):
+    """Опрашивает paths раз в interval секунд и вызывает rebuild() после изменений. Ctrl+C — выход."""
+    import time
+    print(f"👀 Слежу за изменениями ({len(paths)} путей), Ctrl+C — выход")
+    before = _snapshot(paths)
+    try:
+        while True:
+            time.sleep(interval)
+            after = _snapshot(paths)
+            if after != before:
+                before = after
+                rebuild()
+    except KeyboardInterrupt:
+        pass
+
+
 # Для прямого запуска из командной строки (опционально)
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
         print(
             "Использование: python generate.py data.json [-o output.html] [--width 800] "
-            "[--images DIR] [--base-info base_info.json] [--templates DIR]"
+            "[--images DIR] [--base-info base_info.json] [--templates DIR] [--watch]"
         )
         sys.exit(1)
     json_file = sys.argv[1]
@@ -178,6 +302,7 @@ if __name__ == "__main__":
     images_dir = "images"
     base_info_file = None
     template_dir = None
+    watch_mode = False
     i = 2
     while i < len(sys.argv):
         if sys.argv[i] == "-o" and i + 1 < len(sys.argv):
@@ -195,13 +320,26 @@ if __name__ == "__main__":
         elif sys.argv[i] == "--templates" and i + 1 < len(sys.argv):
             template_dir = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == "--watch":
+            watch_mode = True
+            i += 1
         else:
             i += 1
-    generate_report(
-        json_file=json_file,
-        output_file=out,
-        max_width=width,
-        images_dir=images_dir,
-        base_info_file=base_info_file,
-        template_dir=template_dir,
-    )
\ No newline at end of file
+
+    def build():
+        generate_report(
+            json_file=json_file,
+            output_file=out,
+            max_width=width,
+            images_dir=images_dir,
+            base_info_file=base_info_file,
+            template_dir=template_dir,
+        )
+
+    build()
+    if watch_mode:
+        inputs = [json_file, images_dir,
+                  template_dir or os.path.join(os.path.dirname(__file__), "..", "templates")]
+        if base_info_file:
+            inputs.append(base_info_file)
+        watch(inputs, build)
\ No newline at end of file